@@ -0,0 +1,59 @@
+import pytest
+import pytest_asyncio
+import json
+import uuid
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from vision_wagon import database
+from vision_wagon.database_models import AgentLog
+
+# SQLite has no native UUID column type: store the PostgreSQL UUID columns as CHAR(36) in these tests
+@compiles(UUID, 'sqlite')
+def _sqlite_uuid(element, compiler, **kw):
+    return 'CHAR(36)'
+
+@pytest_asyncio.fixture
+async def sqlite_db(tmp_path, monkeypatch):
+    manager = database.DatabaseManager()
+    monkeypatch.setattr(manager.settings.database, "async_url", f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(manager.settings.system, "auto_migrate", True)
+    monkeypatch.setattr(database, "get_db_manager", lambda: manager)
+    await manager.initialize()
+    yield manager
+    await manager.close()
+
+@pytest.mark.asyncio
+async def test_get_agent_logs_loads_agent(sqlite_db):
+    await database.create_agent({"agent_id": "agent_1", "agent_type": "operational", "name": "Agent 1"})
+    await database.create_agent_logs([
+        {"agent_id": "agent_1", "action": "first", "message": "one"},
+        {"agent_id": "agent_1", "action": "second", "message": "two"},
+    ])
+
+    logs = await database.get_agent_logs(agent_id="agent_1")
+
+    assert len(logs) == 2
+    assert all(log.timestamp is not None for log in logs)
+    assert [log.agent.agent_id if log.agent else None for log in logs] == ["agent_1", "agent_1"]
+
+class DriverUUID(uuid.UUID):
+    """Like asyncpg's UUID: a uuid.UUID subclass"""
+
+def test_to_dict_converts_uuid_subclasses():
+    log_id = DriverUUID(str(uuid.uuid4()))
+    log = AgentLog(id=log_id, agent_id="agent_1", action="first", timestamp=datetime(2026, 1, 1))
+
+    data = log.to_dict()
+
+    assert data["id"] == str(log_id) and type(data["id"]) is str
+    assert data["timestamp"] == "2026-01-01T00:00:00"
+
+def test_to_json_serializes_uuid_subclasses():
+    log_id = DriverUUID(str(uuid.uuid4()))
+    log = AgentLog(id=log_id, agent_id="agent_1", action="first", timestamp=datetime(2026, 1, 1))
+
+    data = json.loads(log.to_json())
+
+    assert data["id"] == str(log_id)
+    assert data["timestamp"].startswith("2026-01-01T00:00:00")
@@ -0,0 +1,71 @@
+import pytest
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from vision_wagon import database
+from vision_wagon.database_models import Agent
+
+def make_agent(name: str) -> Agent:
+    return Agent(agent_id="agent_1", agent_type="operational", name=name, status="active", config={"provider": "test"})
+
+class FakeManager:
+    """get_write_session() stand-in that records when the write commits"""
+    def __init__(self):
+        self.events = []
+
+    @asynccontextmanager
+    async def get_write_session(self):
+        yield SimpleNamespace(bind=SimpleNamespace(dialect=SimpleNamespace(name="sqlite")))
+        self.events.append("commit")
+
+@pytest.fixture
+def shared_cache(monkeypatch):
+    monkeypatch.setattr(database, "_shared_cache_enabled", True)
+    database._shared_cache.clear()
+    yield database._shared_cache
+    database._shared_cache.clear()
+
+def test_shared_cache_hands_out_fresh_instances(shared_cache):
+    database._cache_put(Agent, "agent_1", make_agent("original"), database._shared_cache_epoch)
+
+    first = database._cache_get(Agent, "agent_1")
+    first.name = "mutated"
+    first.config["provider"] = "mutated"
+    second = database._cache_get(Agent, "agent_1")
+
+    assert second is not first
+    assert second.name == "original"
+    assert second.config == {"provider": "test"}
+
+def test_shared_cache_skips_rows_read_before_an_invalidation(shared_cache):
+    epoch = database._shared_cache_epoch # the read starts...
+    database._cache_invalidate(Agent, "agent_1") # ...a write commits meanwhile...
+    database._cache_put(Agent, "agent_1", make_agent("stale"), epoch) # ...and the old row comes back
+
+    assert database._cache_get(Agent, "agent_1") is None
+
+@pytest.mark.asyncio
+async def test_update_agent_invalidates_after_commit(shared_cache, monkeypatch):
+    manager = FakeManager()
+    monkeypatch.setattr(database, "get_db_manager", lambda: manager)
+    database._cache_put(Agent, "agent_1", make_agent("before"), database._shared_cache_epoch)
+
+    async def fake_update_returning(session, model, condition, values):
+        manager.events.append("update")
+        return make_agent(values["name"])
+
+    monkeypatch.setattr(database, "_update_returning", fake_update_returning)
+    epoch = database._shared_cache_epoch
+    original_invalidate = database._cache_invalidate
+
+    def recording_invalidate(model, key):
+        manager.events.append("invalidate")
+        original_invalidate(model, key)
+
+    monkeypatch.setattr(database, "_cache_invalidate", recording_invalidate)
+
+    updated = await database.update_agent("agent_1", {"name": "after"})
+
+    assert updated.name == "after"
+    assert manager.events == ["update", "commit", "invalidate"]
+    assert database._shared_cache_epoch == epoch + 1
+    assert database._cache_get(Agent, "agent_1") is None
@@ -0,0 +1,153 @@
+import pytest
+import asyncio
+from typing import Any, Dict
+from vision_wagon.agents.core.base_agent import BaseAgent, AgentResult
+from vision_wagon.orchestrator import Orchestrator, Task, TaskQueue, TaskPriority, TaskStatus
+
+class RecordingAgent(BaseAgent):
+    agent_id = "recording_agent"
+    agent_type = "operational"
+
+    def __init__(self):
+        super().__init__()
+        self.processed = []
+
+    async def process(self, context: Dict[str, Any]) -> AgentResult:
+        self.processed.append(context["name"])
+        return AgentResult(success=True, data={"name": context["name"]})
+
+def make_task(name: str, priority: TaskPriority = TaskPriority.NORMAL) -> Task:
+    return Task(task_id=name, task_type="test", agent_id="recording_agent", context={"name": name}, priority=priority)
+
+async def make_orchestrator():
+    orchestrator = Orchestrator()
+    agent = RecordingAgent()
+    await orchestrator.register_agent(agent)
+    return orchestrator, agent
+
+async def submit(orchestrator: Orchestrator, name: str, dependencies: list = None) -> str:
+    return await orchestrator.submit_task("test", "recording_agent", {"name": name}, dependencies=dependencies)
+
+async def drain(orchestrator: Orchestrator) -> None:
+    """Runs every queued task inline, as a worker would"""
+    while not orchestrator.task_queue.empty():
+        await orchestrator._dispatch_task(orchestrator.task_queue.get_nowait(), "worker_test")
+
+def test_task_queue_priority_then_fifo():
+    queue = TaskQueue()
+    for task in [make_task("normal_1"), make_task("low", TaskPriority.LOW), make_task("critical", TaskPriority.CRITICAL),
+                 make_task("normal_2"), make_task("high", TaskPriority.HIGH), make_task("normal_3")]:
+        queue.put(task)
+
+    order = [queue.get_nowait().task_id for _ in range(queue.qsize())]
+    assert order == ["critical", "high", "normal_1", "normal_2", "normal_3", "low"]
+    assert queue.empty()
+
+@pytest.mark.asyncio
+async def test_task_queue_put_wakes_a_single_getter():
+    queue = TaskQueue()
+    getters = [asyncio.create_task(queue.get()) for _ in range(3)]
+    await asyncio.sleep(0)
+
+    queue.put(make_task("only"))
+    await asyncio.sleep(0)
+
+    done = [getter for getter in getters if getter.done()]
+    assert len(done) == 1
+    assert done[0].result().task_id == "only"
+    for getter in getters:
+        getter.cancel()
+    await asyncio.gather(*getters, return_exceptions=True)
+
+@pytest.mark.asyncio
+async def test_task_queue_cancelled_getter_passes_wakeup_on():
+    queue = TaskQueue()
+    first = asyncio.create_task(queue.get())
+    second = asyncio.create_task(queue.get())
+    await asyncio.sleep(0)
+
+    queue.put(make_task("only")) # wakes `first`...
+    first.cancel() # ...which is cancelled before it can take the task
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    assert first.cancelled()
+    assert second.done() and second.result().task_id == "only"
+
+@pytest.mark.asyncio
+async def test_dependent_task_is_queued_when_dependency_completes():
+    orchestrator, agent = await make_orchestrator()
+    first = await submit(orchestrator, "first")
+    second = await submit(orchestrator, "second", dependencies=[first])
+
+    assert orchestrator.task_queue.qsize() == 1
+    assert orchestrator.pending_tasks_by_id[second].pending_dependencies == 1
+
+    await drain(orchestrator)
+
+    assert agent.processed == ["first", "second"]
+    assert first in orchestrator.completed_tasks
+    assert second in orchestrator.completed_tasks
+
+@pytest.mark.asyncio
+async def test_cancelling_queued_task_leaves_tombstone_and_fails_dependents():
+    orchestrator, agent = await make_orchestrator()
+    others = [await submit(orchestrator, f"other_{i}") for i in range(4)]
+    first = await submit(orchestrator, "first")
+    second = await submit(orchestrator, "second", dependencies=[first])
+    third = await submit(orchestrator, "third", dependencies=[second])
+
+    assert await orchestrator.cancel_task(first)
+
+    assert orchestrator.failed_tasks[first].status == TaskStatus.CANCELLED
+    assert orchestrator.task_queue._tombstones == 1 # below 25% of the queue: stays until popped
+    assert orchestrator.task_queue.qsize() == 5
+    for dependent in (second, third):
+        assert orchestrator.failed_tasks[dependent].status == TaskStatus.FAILED
+        assert dependent not in orchestrator.pending_tasks_by_id
+
+    await drain(orchestrator)
+
+    assert agent.processed == [f"other_{i}" for i in range(4)]
+    assert orchestrator.task_queue._tombstones == 0
+    assert all(task_id in orchestrator.completed_tasks for task_id in others)
+
+@pytest.mark.asyncio
+async def test_cancelling_parked_task_leaves_no_tombstone():
+    orchestrator, agent = await make_orchestrator()
+    for i in range(4):
+        await submit(orchestrator, f"other_{i}")
+    first = await submit(orchestrator, "first")
+    second = await submit(orchestrator, "second", dependencies=[first])
+
+    assert await orchestrator.cancel_task(second)
+
+    assert orchestrator.task_queue._tombstones == 0
+    assert orchestrator.task_queue.qsize() == 5
+
+    await drain(orchestrator)
+
+    assert agent.processed == [f"other_{i}" for i in range(4)] + ["first"]
+    assert orchestrator.failed_tasks[second].status == TaskStatus.CANCELLED
+    assert orchestrator.task_queue.empty()
+
+@pytest.mark.asyncio
+async def test_retry_does_not_run_on_agent_unregistered_while_running():
+    orchestrator = Orchestrator()
+    orchestrator.retry_delay = 0
+
+    class UnregisteringAgent(RecordingAgent):
+        async def process(self, context: Dict[str, Any]) -> AgentResult:
+            self.processed.append(context["name"])
+            await orchestrator.unregister_agent(self.agent_id)
+            return AgentResult(success=False, error="failed")
+
+    agent = UnregisteringAgent()
+    await orchestrator.register_agent(agent)
+    task_id = await submit(orchestrator, "only")
+
+    await drain(orchestrator)
+
+    assert agent.processed == ["only"]
+    assert orchestrator.failed_tasks[task_id].status == TaskStatus.FAILED
+    assert "Agente no registrado" in orchestrator.failed_tasks[task_id].error
@@ -0,0 +1,183 @@
+"""Esquema inicial (el que creaba create_all antes de la primera migración)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-15 23:30:00
+
+Las bases existentes ya tienen estas tablas (creadas por create_all al arrancar): en ellas esta
+revisión no hace nada y `alembic upgrade head` continúa con las siguientes. En una base vacía
+(p. ej. `make db-reset`) crea el esquema de partida. Sólo PostgreSQL.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+_TABLES = ('agents', 'agent_logs', 'campaigns', 'tasks', 'contents', 'security_events',
+           'system_metrics', 'avatar_personalities')
+
+
+def _indexes(table: str, *columns: str) -> None:
+    """Índices simples con el nombre que les daba index=True (ix_<tabla>_<columna>)"""
+    for column in columns:
+        op.create_index(f'ix_{table}_{column}', table, [column])
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    if existing.intersection(_TABLES):
+        return # esquema ya creado por create_all
+
+    op.create_table(
+        'agents',
+        sa.Column('id', sa.String(36), primary_key=True),
+        sa.Column('agent_id', sa.String(100), nullable=False),
+        sa.Column('agent_type', sa.String(50), nullable=False),
+        sa.Column('name', sa.String(200), nullable=False),
+        sa.Column('description', sa.Text),
+        sa.Column('status', sa.String(20)),
+        sa.Column('config', sa.JSON),
+        sa.Column('created_at', sa.DateTime),
+        sa.Column('updated_at', sa.DateTime),
+        sa.Column('last_execution', sa.DateTime),
+        sa.Column('execution_count', sa.Integer),
+        sa.Column('success_count', sa.Integer),
+        sa.Column('error_count', sa.Integer),
+        sa.Column('average_execution_time', sa.Float),
+    )
+    op.create_index('ix_agents_agent_id', 'agents', ['agent_id'], unique=True)
+    _indexes('agents', 'agent_type', 'status')
+
+    op.create_table(
+        'agent_logs',
+        sa.Column('id', UUID(as_uuid=True), primary_key=True),
+        sa.Column('agent_id', sa.String(100), sa.ForeignKey('agents.agent_id'), nullable=False),
+        sa.Column('execution_id', sa.String(100)),
+        sa.Column('action', sa.String(100), nullable=False),
+        sa.Column('level', sa.String(20)),
+        sa.Column('message', sa.Text),
+        sa.Column('data', sa.JSON),
+        sa.Column('timestamp', sa.DateTime),
+        sa.Column('execution_time', sa.Float),
+        sa.Column('success', sa.Boolean),
+    )
+    _indexes('agent_logs', 'agent_id', 'execution_id', 'action', 'level', 'timestamp')
+
+    op.create_table(
+        'campaigns',
+        sa.Column('id', UUID(as_uuid=True), primary_key=True),
+        sa.Column('name', sa.String(200), nullable=False),
+        sa.Column('description', sa.Text),
+        sa.Column('campaign_type', sa.String(50), nullable=False),
+        sa.Column('status', sa.String(20)),
+        sa.Column('config', sa.JSON),
+        sa.Column('target_audience', sa.JSON),
+        sa.Column('metrics', sa.JSON),
+        sa.Column('budget', sa.Float),
+        sa.Column('start_date', sa.DateTime),
+        sa.Column('end_date', sa.DateTime),
+        sa.Column('created_at', sa.DateTime),
+        sa.Column('updated_at', sa.DateTime),
+        sa.Column('created_by', sa.String(100)),
+    )
+    _indexes('campaigns', 'campaign_type', 'status')
+
+    op.create_table(
+        'tasks',
+        sa.Column('id', UUID(as_uuid=True), primary_key=True),
+        sa.Column('task_type', sa.String(50), nullable=False),
+        sa.Column('title', sa.String(200), nullable=False),
+        sa.Column('description', sa.Text),
+        sa.Column('status', sa.String(20)),
+        sa.Column('priority', sa.Integer),
+        sa.Column('agent_id', sa.String(100), sa.ForeignKey('agents.agent_id')),
+        sa.Column('campaign_id', UUID(as_uuid=True), sa.ForeignKey('campaigns.id')),
+        sa.Column('input_data', sa.JSON),
+        sa.Column('output_data', sa.JSON),
+        sa.Column('error_message', sa.Text),
+        sa.Column('progress', sa.Float),
+        sa.Column('estimated_duration', sa.Integer),
+        sa.Column('actual_duration', sa.Integer),
+        sa.Column('scheduled_at', sa.DateTime),
+        sa.Column('started_at', sa.DateTime),
+        sa.Column('completed_at', sa.DateTime),
+        sa.Column('created_at', sa.DateTime),
+        sa.Column('updated_at', sa.DateTime),
+    )
+    _indexes('tasks', 'task_type', 'status', 'priority', 'agent_id', 'campaign_id')
+
+    op.create_table(
+        'contents',
+        sa.Column('id', UUID(as_uuid=True), primary_key=True),
+        sa.Column('title', sa.String(200), nullable=False),
+        sa.Column('content_type', sa.String(50), nullable=False),
+        sa.Column('format', sa.String(20)),
+        sa.Column('content', sa.Text),
+        sa.Column('content_metadata', sa.JSON),
+        sa.Column('tags', sa.JSON),
+        sa.Column('is_flagged', sa.Boolean),
+        sa.Column('moderation_categories', sa.JSON),
+        sa.Column('moderated_by', sa.String(100)),
+        sa.Column('moderated_at', sa.DateTime),
+        sa.Column('status', sa.String(20)),
+        sa.Column('campaign_id', UUID(as_uuid=True), sa.ForeignKey('campaigns.id')),
+        sa.Column('generated_by', sa.String(100)),
+        sa.Column('quality_score', sa.Float),
+        sa.Column('engagement_metrics', sa.JSON),
+        sa.Column('created_at', sa.DateTime),
+        sa.Column('updated_at', sa.DateTime),
+        sa.Column('published_at', sa.DateTime),
+    )
+    _indexes('contents', 'content_type', 'status', 'campaign_id')
+
+    op.create_table(
+        'security_events',
+        sa.Column('id', UUID(as_uuid=True), primary_key=True),
+        sa.Column('event_type', sa.String(50), nullable=False),
+        sa.Column('severity', sa.String(20), nullable=False),
+        sa.Column('source', sa.String(100), nullable=False),
+        sa.Column('target', sa.String(100)),
+        sa.Column('action', sa.String(100), nullable=False),
+        sa.Column('description', sa.Text),
+        sa.Column('ip_address', sa.String(45)),
+        sa.Column('user_agent', sa.String(500)),
+        sa.Column('additional_data', sa.JSON),
+        sa.Column('resolved', sa.Boolean),
+        sa.Column('resolved_at', sa.DateTime),
+        sa.Column('resolved_by', sa.String(100)),
+        sa.Column('timestamp', sa.DateTime),
+    )
+    _indexes('security_events', 'event_type', 'severity', 'timestamp')
+
+    op.create_table(
+        'system_metrics',
+        sa.Column('id', UUID(as_uuid=True), primary_key=True),
+        sa.Column('metric_name', sa.String(100), nullable=False),
+        sa.Column('metric_type', sa.String(50), nullable=False),
+        sa.Column('value', sa.Float, nullable=False),
+        sa.Column('unit', sa.String(20)),
+        sa.Column('tags', sa.JSON),
+        sa.Column('source', sa.String(100)),
+        sa.Column('timestamp', sa.DateTime),
+    )
+    _indexes('system_metrics', 'metric_name', 'metric_type', 'timestamp')
+
+    op.create_table(
+        'avatar_personalities',
+        sa.Column('id', UUID(as_uuid=True), primary_key=True),
+        sa.Column('avatar_id', sa.String(100), nullable=False),
+        sa.Column('personality_profile', sa.JSON),
+        sa.Column('updated_at', sa.DateTime),
+    )
+    op.create_index('ix_avatar_personalities_avatar_id', 'avatar_personalities', ['avatar_id'], unique=True)
+
+
+def downgrade() -> None:
+    for table in reversed(_TABLES):
+        op.drop_table(table)
@@ -0,0 +1,216 @@
+"""JSONB, UUID nativo en agents.id, defaults del servidor, índices y particionado mensual
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-15 23:30:00
+
+Lleva el esquema inicial al de database_models: create_all nunca altera tablas existentes.
+Si las tablas ya se crearon con el esquema actual (agent_logs ya particionada), no hace nada.
+agent_logs, security_events y system_metrics se reconstruyen como tablas particionadas por
+rango mensual de timestamp (PK (id, timestamp)), copiando sus filas. Sólo PostgreSQL.
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+_UTC_NOW = "TIMEZONE('utc', CURRENT_TIMESTAMP)" # mismo SQL que utcnow() en database_models
+_PARTITION_MONTHS_AHEAD = 2 # como DatabaseManager.ensure_partitions
+
+# Columnas JSON -> JSONB de las tablas que no se reconstruyen
+_JSONB_COLUMNS = {
+    'agents': ('config',),
+    'campaigns': ('config', 'target_audience', 'metrics'),
+    'tasks': ('input_data', 'output_data'),
+    'contents': ('content_metadata', 'tags', 'moderation_categories', 'engagement_metrics'),
+    'avatar_personalities': ('personality_profile',),
+}
+# Columnas que pasan de datetime.utcnow (Python) a default del servidor
+_UTC_DEFAULT_COLUMNS = {
+    'agents': ('created_at', 'updated_at'),
+    'campaigns': ('created_at', 'updated_at'),
+    'tasks': ('created_at', 'updated_at'),
+    'contents': ('created_at', 'updated_at'),
+    'avatar_personalities': ('updated_at',),
+}
+# Tablas particionadas: columnas JSON, índices index=True (antes y después) y claves foráneas
+_PARTITIONED = {
+    'agent_logs': {
+        'json': ('data',),
+        'indexes': ('execution_id', 'action', 'level'),
+        'old_indexes': ('agent_id', 'execution_id', 'action', 'level', 'timestamp'),
+        'foreign_keys': ('CONSTRAINT agent_logs_agent_id_fkey FOREIGN KEY (agent_id) REFERENCES agents (agent_id)',),
+    },
+    'security_events': {
+        'json': ('additional_data',),
+        'indexes': ('event_type', 'severity', 'timestamp'),
+        'old_indexes': ('event_type', 'severity', 'timestamp'),
+        'foreign_keys': (),
+    },
+    'system_metrics': {
+        'json': ('tags',),
+        'indexes': ('metric_name', 'metric_type', 'timestamp'),
+        'old_indexes': ('metric_name', 'metric_type', 'timestamp'),
+        'foreign_keys': (),
+    },
+}
+# Índices compuestos, parciales, GIN y de expresión de las tablas que no se reconstruyen
+_NEW_INDEXES = (
+    ('ix_agents_status_created', 'agents', ['status', 'created_at'], {}),
+    ('ix_agents_active', 'agents', ['id'], {'postgresql_where': sa.text("status = 'active'")}),
+    ('ix_agents_config_provider', 'agents', [sa.text("(config->>'provider')")], {}),
+    ('ix_campaigns_status_created', 'campaigns', ['status', 'created_at'], {}),
+    ('ix_tasks_status_prio_created', 'tasks', ['status', 'priority', 'created_at'], {}),
+    ('ix_tasks_queue', 'tasks', ['status', 'priority', 'scheduled_at'], {}),
+    ('ix_tasks_pending', 'tasks', ['priority', 'scheduled_at'], {'postgresql_where': sa.text("status = 'pending'")}),
+    ('ix_tasks_input_gin', 'tasks', ['input_data'],
+     {'postgresql_using': 'gin', 'postgresql_ops': {'input_data': 'jsonb_path_ops'}}),
+    ('ix_contents_status_created', 'contents', ['status', 'created_at'], {}),
+    ('ix_contents_metadata_gin', 'contents', ['content_metadata'],
+     {'postgresql_using': 'gin', 'postgresql_ops': {'content_metadata': 'jsonb_path_ops'}}),
+    ('ix_contents_views', 'contents', [sa.text("((engagement_metrics->>'views')::int)")], {}),
+)
+# Índices propios (no index=True) de las tablas particionadas
+_NEW_PARTITIONED_INDEXES = (
+    ('ix_agent_logs_timestamp', 'agent_logs', ['timestamp'],
+     {'postgresql_include': ['agent_id', 'level', 'action']}),
+    ('ix_agent_logs_agent_ts', 'agent_logs', ['agent_id', 'timestamp'], {}),
+    ('ix_security_events_data_gin', 'security_events', ['additional_data'],
+     {'postgresql_using': 'gin', 'postgresql_ops': {'additional_data': 'jsonb_path_ops'}}),
+    ('ix_security_events_open', 'security_events', ['severity', 'timestamp'],
+     {'postgresql_where': sa.text('resolved = false')}),
+    ('ix_system_metrics_tags_gin', 'system_metrics', ['tags'],
+     {'postgresql_using': 'gin', 'postgresql_ops': {'tags': 'jsonb_path_ops'}}),
+)
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _drop_secondary_indexes(table: str) -> None:
+    """Borra los índices de `table` salvo el de la PK (los de una tabla particionada, en cascada)"""
+    names = op.get_bind().execute(sa.text(
+        "SELECT i.relname FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid "
+        "WHERE x.indrelid = CAST(:table AS regclass) AND NOT x.indisprimary"
+    ), {'table': table}).scalars().all()
+    for name in names:
+        op.execute(f'DROP INDEX "{name}"')
+
+
+def _copy_rows(source: str, target: str, json_columns: tuple, json_type: str) -> None:
+    """INSERT ... SELECT de todas las columnas, convirtiendo las JSON y rellenando timestamp nulos"""
+    columns = [c['name'] for c in sa.inspect(op.get_bind()).get_columns(source)]
+    values = [
+        f'"{c}"::{json_type}' if c in json_columns
+        else f'COALESCE("timestamp", {_UTC_NOW})' if c == 'timestamp'
+        else f'"{c}"'
+        for c in columns
+    ]
+    quoted = ', '.join(f'"{c}"' for c in columns)
+    op.execute(f'INSERT INTO {target} ({quoted}) SELECT {", ".join(values)} FROM {source}')
+
+
+def _create_monthly_partitions(table: str, source: str) -> None:
+    """Particiones desde el mes más antiguo de `source` hasta _PARTITION_MONTHS_AHEAD meses adelante"""
+    oldest = op.get_bind().execute(sa.text(f'SELECT min("timestamp") FROM {source}')).scalar()
+    now = datetime.utcnow()
+    month = datetime((oldest or now).year, (oldest or now).month, 1)
+    last = _add_months(datetime(now.year, now.month, 1), _PARTITION_MONTHS_AHEAD)
+    while month <= last:
+        end = _add_months(month, 1)
+        op.execute(
+            f'CREATE TABLE "{table}_{month:%Y_%m}" PARTITION OF {table} '
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+        )
+        month = end
+
+
+def _partition_table(table: str, spec: dict) -> None:
+    old = f'{table}_old'
+    op.execute(f'ALTER TABLE {table} RENAME TO {old}')
+    op.execute(f'ALTER TABLE {old} RENAME CONSTRAINT {table}_pkey TO {old}_pkey')
+    _drop_secondary_indexes(old) # sus nombres son los que usará la tabla nueva
+
+    op.execute(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) PARTITION BY RANGE ("timestamp")')
+    for column in spec['json']:
+        op.execute(f'ALTER TABLE {table} ALTER COLUMN "{column}" TYPE JSONB USING "{column}"::jsonb')
+    op.execute(f'ALTER TABLE {table} ALTER COLUMN "timestamp" SET DEFAULT {_UTC_NOW}, '
+               f'ALTER COLUMN "timestamp" SET NOT NULL')
+    op.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, "timestamp")')
+    for foreign_key in spec['foreign_keys']:
+        op.execute(f'ALTER TABLE {table} ADD {foreign_key}')
+    op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+    _create_monthly_partitions(table, old)
+
+    _copy_rows(old, table, spec['json'], 'jsonb')
+    op.drop_table(old)
+    for column in spec['indexes']: # después de la copia: más rápido que mantenerlos fila a fila
+        op.create_index(f'ix_{table}_{column}', table, [column])
+
+
+def _unpartition_table(table: str, spec: dict) -> None:
+    part = f'{table}_part'
+    _drop_secondary_indexes(table)
+    op.execute(f'ALTER TABLE {table} RENAME TO {part}')
+    op.execute(f'ALTER TABLE {part} RENAME CONSTRAINT {table}_pkey TO {part}_pkey')
+
+    op.execute(f'CREATE TABLE {table} (LIKE {part} INCLUDING DEFAULTS)')
+    for column in spec['json']:
+        op.execute(f'ALTER TABLE {table} ALTER COLUMN "{column}" TYPE JSON USING "{column}"::json')
+    op.execute(f'ALTER TABLE {table} ALTER COLUMN "timestamp" DROP DEFAULT, '
+               f'ALTER COLUMN "timestamp" DROP NOT NULL')
+    op.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id)')
+    for foreign_key in spec['foreign_keys']:
+        op.execute(f'ALTER TABLE {table} ADD {foreign_key}')
+
+    _copy_rows(part, table, spec['json'], 'json')
+    op.drop_table(part) # junto con sus particiones
+    for column in spec['old_indexes']:
+        op.create_index(f'ix_{table}_{column}', table, [column])
+
+
+def upgrade() -> None:
+    partitioned = op.get_bind().execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('agent_logs'))"
+    )).scalar()
+    if partitioned:
+        return # tablas creadas por create_all con el esquema actual: no hay nada que migrar
+
+    op.execute('ALTER TABLE agents ALTER COLUMN id TYPE UUID USING id::uuid')
+    for table, columns in _JSONB_COLUMNS.items():
+        op.execute(f'ALTER TABLE {table} ' + ', '.join(
+            f'ALTER COLUMN "{c}" TYPE JSONB USING "{c}"::jsonb' for c in columns))
+    for table, columns in _UTC_DEFAULT_COLUMNS.items():
+        op.execute(f'ALTER TABLE {table} ' + ', '.join(
+            f'ALTER COLUMN "{c}" SET DEFAULT {_UTC_NOW}' for c in columns))
+
+    # agent_logs pierde sus índices simples de agent_id y timestamp: los cubren los compuestos
+    for table, spec in _PARTITIONED.items():
+        _partition_table(table, spec)
+
+    for name, table, columns, kwargs in _NEW_INDEXES + _NEW_PARTITIONED_INDEXES:
+        op.create_index(name, table, columns, **kwargs)
+
+
+def downgrade() -> None:
+    for name, table, _, _ in _NEW_INDEXES:
+        op.drop_index(name, table_name=table)
+
+    for table, spec in _PARTITIONED.items():
+        _unpartition_table(table, spec)
+
+    for table, columns in _UTC_DEFAULT_COLUMNS.items():
+        op.execute(f'ALTER TABLE {table} ' + ', '.join(f'ALTER COLUMN "{c}" DROP DEFAULT' for c in columns))
+    for table, columns in _JSONB_COLUMNS.items():
+        op.execute(f'ALTER TABLE {table} ' + ', '.join(
+            f'ALTER COLUMN "{c}" TYPE JSON USING "{c}"::json' for c in columns))
+    op.execute('ALTER TABLE agents ALTER COLUMN id TYPE VARCHAR(36) USING id::text')
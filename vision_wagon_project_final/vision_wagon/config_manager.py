@@ -7,6 +7,7 @@ import os
 import yaml
 import json
 import logging
+import logging.handlers
 from typing import Dict, Any, Optional, Union, List
 from pathlib import Path
 from dataclasses import dataclass, field
@@ -22,7 +23,10 @@ class DatabaseConfig:
     pool_size: int = 5
     max_overflow: int = 10
     pool_timeout: int = 30
-    pool_recycle: int = 3600
+    pool_recycle: int = 1800
+    max_concurrent_queries: int = 0  # 0 = usar pool_size/max_overflow tal cual
+    server_max_connections: int = 100  # max_connections del servidor PostgreSQL
+    statement_cache_size: int = 2048  # sentencias preparadas por conexión (asyncpg); 0 = desactivado
 
 @dataclass
 class AgentConfig:
@@ -77,6 +81,7 @@ class OrchestratorConfig:
     health_check_interval: float = 60.0
     enable_task_queue: bool = True
     queue_backend: str = "memory"  # memory, redis, rabbitmq
+    max_retained_tasks: int = 10000  # tareas completadas/fallidas conservadas completas
 
 @dataclass
 class SystemConfig:
@@ -90,6 +95,20 @@ class SystemConfig:
     data_directory: str = "data"
     temp_directory: str = "temp"
     max_upload_size: int = 104857600  # 100MB
+    serverless: bool = False  # procesos efímeros: sin pool de conexiones
+    auto_migrate: bool = True  # create_all al arrancar; en producción usar Alembic y desactivarlo
+
+_ASYNC_DRIVERS = {
+    'postgres': 'postgresql+asyncpg',
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+def _to_async_url(url: str) -> str:
+    """Convierte una URL síncrona (psycopg2/sqlite) a su driver asíncrono"""
+    scheme, sep, rest = url.partition('://')
+    return f"{_ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
 
 class ConfigManager:
     """Gestor centralizado de configuración"""
@@ -112,6 +131,7 @@ class ConfigManager:
         self.logging = LoggingConfig()
         self.orchestrator = OrchestratorConfig()
         self.system = SystemConfig()
+        self._log_listener = None  # QueueListener que escribe los logs en un hilo aparte
         
         # Cargar configuración
         self._load_config()
@@ -168,6 +188,8 @@ class ConfigManager:
             'DEBUG': ('system', 'debug'),
             'HOST': ('system', 'host'),
             'PORT': ('system', 'port'),
+            'SERVERLESS': ('system', 'serverless'),
+            'AUTO_MIGRATE': ('system', 'auto_migrate'),
             
             # Logging
             'LOG_LEVEL': ('logging', 'level'),
@@ -177,7 +199,7 @@ class ConfigManager:
             value = os.getenv(env_var)
             if value is not None:
                 # Convertir tipos según sea necesario
-                if key in ['enable_authentication', 'debug']:
+                if key in ['enable_authentication', 'debug', 'serverless', 'auto_migrate']:
                     value = value.lower() in ['true', '1', 'yes', 'on']
                 elif key == 'port':
                     value = int(value)
@@ -188,6 +210,12 @@ class ConfigManager:
                     setattr(config_obj, key, value)
                     logger.debug(f"Variable de entorno aplicada: {env_var} -> {section}.{key}")
 
+        # Con sólo DATABASE_URL (p. ej. docker-compose) el motor asíncrono usaría el SQLite por defecto:
+        # derivar la URL asíncrona equivalente (asyncpg / aiosqlite)
+        if os.getenv('DATABASE_URL') and not os.getenv('ASYNC_DATABASE_URL'):
+            self.database.async_url = _to_async_url(self.database.url)
+            logger.debug("URL asíncrona derivada de DATABASE_URL")
+
     def _apply_config(self, config_data: Dict[str, Any]) -> None:
         """Aplica la configuración cargada a los objetos de configuración"""
         for section_name, section_data in config_data.items():
@@ -318,6 +346,9 @@ class ConfigManager:
                 'max_overflow': self.database.max_overflow,
                 'pool_timeout': self.database.pool_timeout,
                 'pool_recycle': self.database.pool_recycle,
+                'max_concurrent_queries': self.database.max_concurrent_queries,
+                'server_max_connections': self.database.server_max_connections,
+                'statement_cache_size': self.database.statement_cache_size,
             },
             'agent': {
                 'max_retries': self.agent.max_retries,
@@ -356,6 +387,7 @@ class ConfigManager:
                 'health_check_interval': self.orchestrator.health_check_interval,
                 'enable_task_queue': self.orchestrator.enable_task_queue,
                 'queue_backend': self.orchestrator.queue_backend,
+                'max_retained_tasks': self.orchestrator.max_retained_tasks,
             },
             'system': {
                 'environment': self.system.environment,
@@ -367,6 +399,8 @@ class ConfigManager:
                 'data_directory': self.system.data_directory,
                 'temp_directory': self.system.temp_directory,
                 'max_upload_size': self.system.max_upload_size,
+                'serverless': self.system.serverless,
+                'auto_migrate': self.system.auto_migrate,
             }
         }
         
@@ -397,28 +431,42 @@ class ConfigManager:
         }
 
     def setup_logging(self) -> None:
-        """Configura el sistema de logging según la configuración"""
-        import logging.handlers
+        """
+        Configura el sistema de logging según la configuración.
+
+        El logger raíz solo encola registros (QueueHandler); un QueueListener en un hilo
+        aparte los escribe en consola/archivo, así la E/S no bloquea el event loop.
+        """
+        import queue
         
         # Configurar nivel de logging
         numeric_level = getattr(logging, self.logging.level.upper(), logging.INFO)
         
         # Configurar formato
         formatter = logging.Formatter(self.logging.format)
+
+        # Hilo y proceso sólo se registran si el formato (configurable) los usa
+        log_format = self.logging.format
+        logging.logThreads = '%(thread' in log_format # %(thread)d y %(threadName)s
+        logging.logProcesses = '%(process)' in log_format
         
         # Logger raíz
         root_logger = logging.getLogger()
         root_logger.setLevel(numeric_level)
         
-        # Limpiar handlers existentes
+        # Limpiar handlers existentes (y el listener de una configuración anterior)
+        self.stop_logging()
         for handler in root_logger.handlers[:]:
             root_logger.removeHandler(handler)
+            handler.close()
         
+        handlers = []
+
         # Handler de consola
         if self.logging.console_enabled:
             console_handler = logging.StreamHandler()
             console_handler.setFormatter(formatter)
-            root_logger.addHandler(console_handler)
+            handlers.append(console_handler)
         
         # Handler de archivo
         if self.logging.file_enabled:
@@ -432,7 +480,31 @@ class ConfigManager:
                 backupCount=self.logging.backup_count
             )
             file_handler.setFormatter(formatter)
-            root_logger.addHandler(file_handler)
+            handlers.append(file_handler)
+
+        if handlers:
+            log_queue = queue.Queue(-1)
+            root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+            self._log_listener = logging.handlers.QueueListener(
+                log_queue, *handlers, respect_handler_level=True
+            )
+            self._log_listener.start()
+
+    def stop_logging(self) -> None:
+        """
+        Vacía los logs encolados y detiene el hilo del QueueListener. Los handlers reales
+        vuelven al logger raíz, así los mensajes posteriores se escriben de forma síncrona.
+        """
+        if self._log_listener is None:
+            return
+        self._log_listener.stop()
+        root_logger = logging.getLogger()
+        for handler in root_logger.handlers[:]:
+            if isinstance(handler, logging.handlers.QueueHandler):
+                root_logger.removeHandler(handler)
+        for handler in self._log_listener.handlers:
+            root_logger.addHandler(handler)
+        self._log_listener = None
 
 # Instancia global del gestor de configuración
 config_manager = ConfigManager()
@@ -253,7 +253,7 @@ class Constructor:
             cache_key = self._generate_cache_key(request)
             if cache_key in self.content_cache:
                 logger.info(f"Cache hit para solicitud {request.request_id}")
-                request.result = self.content_cache[cache_key].__dict__
+                request.result = self.content_cache[cache_key].to_dict()
                 request.status = GenerationStatus.COMPLETED
                 request.completed_at = datetime.utcnow()
                 self.metrics['cache_hits'] += 1
@@ -280,7 +280,7 @@ class Constructor:
                 raise ValueError(f"Tipo de contenido no soportado: {request.content_type}")
             
             # Guardar resultado
-            request.result = result.__dict__
+            request.result = result.to_dict()
             request.status = GenerationStatus.COMPLETED
             request.completed_at = datetime.utcnow()
             
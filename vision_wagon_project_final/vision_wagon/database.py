@@ -2,27 +2,52 @@
 Database operations for Vision Wagon project.
 Optimized version with proper async SQLAlchemy usage.
 """
+from __future__ import annotations
+
 import asyncio
+import copy
+import functools
+import json
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple # Tuple was not used, removed for cleanliness
-from contextlib import asynccontextmanager
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from enum import Enum
+from typing import Dict, List, Optional, Any, Tuple, AsyncIterator, Awaitable, Callable
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
 
 from sqlalchemy import (
-    create_engine, # This was not used directly, create_async_engine is used. Kept for now.
     select,
     delete,
-    update,
     func,
-    and_,
-    or_,
+    insert,
+    update,
+    bindparam,
+    lambda_stmt,
     desc,
-    asc
+    literal,
+    union_all,
+    case,
+    cast,
+    text,
+    true,
+    false,
+    DateTime,
+    JSON,
 )
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy.orm import joinedload, make_transient_to_detached, raiseload, selectinload
+from sqlalchemy.pool import NullPool
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
-from sqlalchemy.dialects.postgresql import insert # Specific to PostgreSQL, ensure DB compatibility or make generic
+
+try:
+    import orjson # Optional: C-accelerated JSON for the telemetry export paths
+except ImportError: # pragma: no cover - falls back to stdlib json
+    orjson = None
 
 from .database_models import (
     Base,
@@ -33,7 +58,9 @@ from .database_models import (
     Content,
     SecurityEvent,
     SystemMetric,
-    AvatarPersonality
+    AvatarPersonality,
+    PARTITIONED_TABLES,
+    utcnow,
 )
 # Assuming config.py will be created or config_manager adapted
 from .config_manager import get_config # Using existing config_manager
@@ -41,34 +68,149 @@ from .config_manager import get_config # Using existing config_manager
 logger = logging.getLogger(__name__)
 # settings = get_settings() # Replaced with get_config()
 
+_POOL_CONNECTION_MARGIN = 5 # server connections left free per worker (migrations, psql, monitoring)
+
+# Monthly range partitions of the time-series tables (see database_models.PARTITIONED_TABLES)
+_PARTITION_MONTHS_AHEAD = 2
+_IS_PARTITIONED_STMT = text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))")
+_PARTITIONS_STMT = text(
+    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+    "WHERE i.inhparent = to_regclass(:table)"
+)
+
+def _month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def _partition_name(table_name: str, month: datetime) -> str:
+    return f"{table_name}_{month:%Y_%m}"
+
 class DatabaseManager:
     """Manages database connections and operations."""
     
     def __init__(self):
+        # Single AsyncEngine (and therefore a single connection pool). Sync callers
+        # borrow the same pool through `sync_engine` instead of building a second engine.
         self.engine = None
         self.session_factory = None
         self._initialized = False
+        self._init_lock = asyncio.Lock() # concurrent initialize() calls (e.g. gathered startup) run it once
+        self._listener_conn = None # dedicated asyncpg connection for cache invalidation NOTIFYs
+        self._listener_reconnect = None # task re-establishing LISTEN after the connection dropped
         self.settings = get_config() # Load settings via existing config_manager
 
+    @property
+    def sync_engine(self):
+        """Sync view of the async engine, sharing its pool (e.g. for Alembic or inspection)."""
+        if self.engine is None:
+            return None
+        return self.engine.sync_engine
+
+    def _engine_kwargs(self, db_url: str) -> Dict[str, Any]:
+        """Build create_async_engine kwargs; pool sizing only applies to queue-pooled backends."""
+        kwargs: Dict[str, Any] = {
+            'echo': self.settings.system.debug,
+            'pool_pre_ping': True, # Good practice
+            'pool_recycle': self.settings.database.pool_recycle or 1800,
+            'insertmanyvalues_page_size': 1000, # rows per batched INSERT ... VALUES for executemany()
+            'query_cache_size': 2000, # compiled-statement LRU; each filter combination is one entry
+        }
+        if self.settings.system.serverless:
+            kwargs['poolclass'] = NullPool # short-lived processes should not keep idle connections
+        elif not db_url.startswith('sqlite'):
+            pool_size, max_overflow = self._pool_sizing()
+            kwargs.update(
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_timeout=self.settings.database.pool_timeout or 30,
+                pool_use_lifo=True, # reuse hot connections; idle ones at the tail age out via pool_recycle
+            )
+        # JSON/JSONB column values are (de)serialized through these on every row; asyncpg's
+        # binary jsonb codec (registered by the dialect) hands them raw text, UUIDs decode natively.
+        # Both serializers accept the same types (_json_default), with or without orjson.
+        kwargs['json_serializer'] = _column_json_text
+        if orjson is not None:
+            kwargs['json_deserializer'] = orjson.loads
+        if db_url.startswith('postgresql+asyncpg'):
+            cache_size = self.settings.database.statement_cache_size
+            kwargs['connect_args'] = {
+                'statement_cache_size': cache_size, # asyncpg's per-connection prepared statement LRU
+                'prepared_statement_cache_size': cache_size, # SQLAlchemy asyncpg adapter's LRU on top of it
+            }
+        return kwargs
+
+    def _log_statement_cache(self, engine_kwargs: Dict[str, Any]) -> None:
+        """Log the prepared-statement cache; it is per connection, so the server holds up to pool x cache plans."""
+        cache_size = engine_kwargs.get('connect_args', {}).get('statement_cache_size')
+        if cache_size is None:
+            return
+        connections = engine_kwargs.get('pool_size', 1) + engine_kwargs.get('max_overflow', 0)
+        logger.info(
+            f"asyncpg prepared statement cache: {cache_size} per connection, "
+            f"up to {cache_size * connections} across {connections} pooled connections"
+        )
+
+    def _pool_sizing(self) -> Tuple[int, int]:
+        """(pool_size, max_overflow) from expected concurrency, capped by this worker's share of the server."""
+        db = self.settings.database
+        if not db.max_concurrent_queries:
+            return db.pool_size or 20, db.max_overflow or 30 # Use config values or defaults
+        workers = max(self.settings.system.workers or 1, 1)
+        budget = max(db.server_max_connections // workers - _POOL_CONNECTION_MARGIN, 1)
+        pool_size = min(db.max_concurrent_queries, budget)
+        return pool_size, min(pool_size, budget - pool_size)
+
+    async def create_tables(self):
+        """Create all tables through the async engine's pool using run_sync."""
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def ensure_partitions(self, months_ahead: int = _PARTITION_MONTHS_AHEAD) -> None:
+        """
+        Create the monthly partitions of the time-series tables, from the current month through
+        `months_ahead` months ahead (PostgreSQL only). Rows outside them land in <table>_default.
+        """
+        if self.engine.dialect.name != 'postgresql':
+            return
+        first = _month_start(datetime.utcnow())
+        async with self.engine.begin() as conn:
+            for table in PARTITIONED_TABLES:
+                partitioned = await conn.scalar(_IS_PARTITIONED_STMT, {'table': table.name})
+                if not partitioned:
+                    logger.warning(f"{table.name} is not a partitioned table; skipping monthly partitions")
+                    continue
+                for i in range(months_ahead + 1):
+                    start, end = _add_months(first, i), _add_months(first, i + 1)
+                    name = _partition_name(table.name, start)
+                    try:
+                        async with conn.begin_nested():
+                            await conn.execute(text(
+                                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table.name}" '
+                                f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+                            ))
+                    except SQLAlchemyError as e:
+                        # e.g. <table>_default already holds rows for that month
+                        logger.warning(f"Could not create partition {name}: {e}")
+
     async def initialize(self):
         """Initialize database engine and session factory."""
         if self._initialized:
             return
+        async with self._init_lock:
+            if self._initialized: # another caller finished while we waited
+                return
+            await self._initialize()
 
+    async def _initialize(self):
         try:
             db_url = self.settings.database.async_url # Get from loaded config
-            db_debug_echo = self.settings.system.debug # Get from loaded config
-
-            self.engine = create_async_engine(
-                db_url,
-                echo=db_debug_echo,
-                pool_size=self.settings.database.pool_size or 20, # Use config values or defaults
-                max_overflow=self.settings.database.max_overflow or 30,
-                pool_pre_ping=True, # Good practice
-                pool_recycle=self.settings.database.pool_recycle or 3600,
-                pool_timeout=self.settings.database.pool_timeout or 30,
-                future=True # future=True is default in SQLAlchemy 2.0, can be omitted
-            )
+
+            engine_kwargs = self._engine_kwargs(db_url)
+            self.engine = create_async_engine(db_url, **engine_kwargs)
+            self._log_statement_cache(engine_kwargs)
 
             self.session_factory = async_sessionmaker(
                 bind=self.engine,
@@ -76,8 +218,10 @@ class DatabaseManager:
                 expire_on_commit=False
             )
 
-            async with self.engine.begin() as conn:
-                await conn.run_sync(Base.metadata.create_all)
+            if self.settings.system.auto_migrate:
+                await self.create_tables()
+            await self.ensure_partitions()
+            await self._start_cache_listener()
 
             self._initialized = True
             logger.info("Database initialized successfully using new DatabaseManager")
@@ -86,8 +230,69 @@ class DatabaseManager:
             logger.error(f"Failed to initialize database with new DatabaseManager: {e}", exc_info=True)
             raise
 
+    async def _start_cache_listener(self) -> None:
+        """Enable the shared agent/avatar cache; with several workers it needs PostgreSQL LISTEN/NOTIFY."""
+        global _shared_cache_enabled
+        if self.engine.dialect.driver == 'asyncpg':
+            await self._connect_cache_listener()
+        # Without a listener, invalidation is process-local: only safe for a single worker.
+        _shared_cache_enabled = self._listener_conn is not None or self._single_worker()
+
+    def _single_worker(self) -> bool:
+        return (self.settings.system.workers or 1) <= 1
+
+    async def _connect_cache_listener(self) -> bool:
+        """Open the LISTEN connection; False (and a warning) if it can't be established."""
+        try:
+            import asyncpg
+            dsn = self.engine.url.set(drivername='postgresql').render_as_string(hide_password=False)
+            conn = await asyncpg.connect(dsn)
+            await conn.add_listener(_CACHE_CHANNEL, _on_cache_notification)
+            conn.add_termination_listener(self._on_cache_listener_lost)
+            self._listener_conn = conn
+            return True
+        except Exception as e:
+            logger.warning(f"Cache invalidation listener unavailable: {e}")
+            self._listener_conn = None
+            return False
+
+    def _on_cache_listener_lost(self, connection) -> None:
+        """asyncpg termination callback: NOTIFYs sent while LISTEN is down would be missed."""
+        global _shared_cache_enabled, _shared_cache_epoch
+        if connection is not self._listener_conn:
+            return # closed on purpose by close()
+        self._listener_conn = None
+        if self._single_worker():
+            return # invalidation is process-local anyway
+        _shared_cache_enabled = False
+        _shared_cache_epoch += 1 # reads in flight must not refill it either
+        _shared_cache.clear()
+        logger.warning("Cache invalidation listener lost; shared cache disabled until it reconnects")
+        self._listener_reconnect = asyncio.get_running_loop().create_task(self._reconnect_cache_listener())
+
+    async def _reconnect_cache_listener(self) -> None:
+        global _shared_cache_enabled
+        delay = 1.0
+        while self.engine is not None:
+            await asyncio.sleep(delay)
+            if await self._connect_cache_listener():
+                _shared_cache_enabled = True # empty since the drop, so nothing missed is served
+                logger.info("Cache invalidation listener re-established; shared cache enabled")
+                return
+            delay = min(delay * 2, 30.0)
+
     async def close(self):
         """Close database connections."""
+        global _shared_cache_enabled
+        _shared_cache_enabled = False
+        _shared_cache.clear()
+        _ttl_cache.clear() # stats and counts from this engine must not outlive it
+        if self._listener_reconnect is not None:
+            self._listener_reconnect.cancel()
+            self._listener_reconnect = None
+        if self._listener_conn is not None:
+            listener_conn, self._listener_conn = self._listener_conn, None
+            await listener_conn.close()
         if self.engine:
             await self.engine.dispose()
             self.engine = None # Clear the engine
@@ -95,9 +300,7 @@ class DatabaseManager:
             self._initialized = False
             logger.info("Database connections closed by new DatabaseManager")
 
-    @asynccontextmanager
-    async def get_session(self) -> AsyncSession: # Added return type hint
-        """Get async database session with proper cleanup."""
+    async def _ensure_session_factory(self) -> None:
         if not self._initialized or not self.session_factory: # Added not self.session_factory check
             # This should ideally not happen if initialize is called correctly at startup
             logger.warning("DatabaseManager not initialized or session_factory is None. Attempting to initialize.")
@@ -106,7 +309,24 @@ class DatabaseManager:
                  logger.error("Failed to create session_factory after re-initialization attempt.")
                  raise RuntimeError("Database session factory is not available.")
 
+    @asynccontextmanager
+    async def get_read_session(self) -> AsyncSession:
+        """Session for read-only helpers: AUTOCOMMIT connection, no BEGIN/COMMIT round trips."""
+        await self._ensure_session_factory()
+        session = self.session_factory()
+        try:
+            await session.connection(execution_options={'isolation_level': 'AUTOCOMMIT'})
+            yield session
+        except Exception as e:
+            logger.error(f"Database read session error: {e}", exc_info=True)
+            raise
+        finally:
+            await session.close()
 
+    @asynccontextmanager
+    async def get_write_session(self) -> AsyncSession: # Added return type hint
+        """Get async database session with proper cleanup; commits on successful exit."""
+        await self._ensure_session_factory()
         session = self.session_factory()
         try:
             yield session
@@ -126,7 +346,268 @@ class DatabaseManager:
         finally:
             await session.close()
 
-db_manager = DatabaseManager()
+    get_session = get_write_session # backwards-compatible name
+
+_db_manager: Optional[DatabaseManager] = None
+
+def get_db_manager() -> DatabaseManager:
+    """Return the process-wide DatabaseManager, creating it on first use."""
+    global _db_manager
+    if _db_manager is None:
+        _db_manager = DatabaseManager()
+    return _db_manager
+
+def __getattr__(name: str) -> Any:
+    # Backwards compatibility for `from .database import db_manager` without
+    # building the manager at import time.
+    if name == 'db_manager':
+        return get_db_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _json_default(value: Any) -> Any:
+    """Known non-JSON types, encoded the same with orjson and stdlib json; anything else is an error."""
+    if isinstance(value, date): # datetime included
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, Decimal)):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _dumps(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default)
+    return json.dumps(payload, default=_json_default).encode('utf-8')
+
+def _column_json_dumps(value: Any) -> str:
+    """Engine json_serializer: orjson, with stdlib-compatible handling of non-str dict keys."""
+    return orjson.dumps(value, default=_json_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+def _column_json_text(value: Any) -> str:
+    """JSON column value as text for paths that bypass the engine serializer (COPY)."""
+    if orjson is not None:
+        return _column_json_dumps(value)
+    return json.dumps(value, default=_json_default)
+
+# List queries are built as lambda statements: the cache key depends only on which filters are
+# present, and filter values / limit / offset are extracted as bind parameters. Repeat calls skip
+# both statement construction and SQL compilation.
+def _apply_steps(stmt, steps: list, limit: Optional[int] = None, offset: Optional[int] = None):
+    """Append filter steps and OFFSET/LIMIT to a lambda statement."""
+    for step in steps:
+        stmt += step
+    if offset is not None:
+        stmt += lambda s: s.offset(offset)
+    if limit is not None:
+        stmt += lambda s: s.limit(limit)
+    return stmt
+
+async def _select_rows_json(table, filters: list, order_col, limit: Optional[int], offset: Optional[int]) -> bytes:
+    """Run a Core SELECT over `table` and serialize the row tuples directly to JSON bytes."""
+    stmt = lambda_stmt(lambda: select(*table.c).order_by(desc(order_col)))
+    stmt = _apply_steps(stmt, filters, limit, offset)
+
+    async with get_db_manager().get_read_session() as session:
+        result = await session.execute(stmt)
+        keys = tuple(result.keys())
+        return _dumps([dict(zip(keys, row)) for row in result])
+
+_STREAM_CHUNK_SIZE = 1000 # rows fetched per server-side cursor round trip
+
+async def _stream_scalars(stmt) -> AsyncIterator[Any]:
+    """Yield ORM objects from a server-side cursor; peak memory stays O(chunk) for any result size."""
+    # Server-side cursors need an open transaction on PostgreSQL, so this stays off the AUTOCOMMIT read session.
+    async with get_db_manager().get_write_session() as session:
+        result = await session.stream_scalars(stmt.execution_options(yield_per=_STREAM_CHUNK_SIZE))
+        async for obj in result:
+            yield obj
+
+def _check_columns(model, data: Dict[str, Any]) -> None:
+    """Reject keys that are not columns of `model`, as Model(**data) does (bulk insert() would drop them)."""
+    columns = model.__table__.c
+    for key in data:
+        if key not in columns:
+            raise TypeError(f"{key!r} is an invalid keyword argument for {model.__name__}")
+
+async def _insert_returning(session: AsyncSession, model, data: Dict[str, Any]):
+    """INSERT ... RETURNING the new row in one round trip (no flush + refresh SELECT)."""
+    _check_columns(model, data)
+    if not session.bind.dialect.insert_returning:
+        # e.g. SQLite < 3.35: fall back to flush + refresh to pick up generated values
+        obj = model(**data)
+        session.add(obj)
+        await session.flush()
+        await session.refresh(obj)
+        return obj
+    result = await session.execute(
+        # Rows written here are returned as-is: no relationship loads piggy-back on the INSERT.
+        insert(model).values(**data).returning(model).options(raiseload('*')),
+        execution_options={'populate_existing': True}, # returned row wins over any stale identity-map copy
+    )
+    return result.scalar_one()
+
+async def _insert_many_returning(session: AsyncSession, model, rows: List[Dict[str, Any]]) -> list:
+    """Batched INSERT ... RETURNING for a list of rows (SQLAlchemy "insertmanyvalues"), in input order."""
+    if not rows:
+        return []
+    for data in rows:
+        _check_columns(model, data)
+    if not session.bind.dialect.insert_returning:
+        objs = [model(**data) for data in rows]
+        session.add_all(objs)
+        await session.flush()
+        for obj in objs: # pick up server-side defaults (timestamps)
+            await session.refresh(obj)
+        return objs
+    result = await session.scalars(
+        insert(model).returning(model, sort_by_parameter_order=True).options(raiseload('*')),
+        rows,
+        execution_options={'populate_existing': True},
+    )
+    return list(result.all())
+
+async def _update_returning(session: AsyncSession, model, condition, values: Dict[str, Any]):
+    """UPDATE ... RETURNING the row in one round trip; None when nothing matched."""
+    reselect = select(model).where(condition).options(raiseload('*'))
+    if not values:
+        result = await session.execute(reselect)
+        return result.scalar_one_or_none()
+    stmt = update(model).where(condition).values(**values)
+    if not session.bind.dialect.update_returning:
+        await session.execute(stmt, execution_options={'synchronize_session': False})
+        result = await session.execute(reselect)
+        return result.scalar_one_or_none()
+    result = await session.execute(
+        stmt.returning(model).options(raiseload('*')), execution_options={'synchronize_session': False}
+    )
+    return result.scalar_one_or_none()
+
+def _column_values(model, updates: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only keys that are real columns of `model` (ignores relationships and unknown keys)."""
+    columns = model.__table__.c
+    return {field: value for field, value in updates.items() if field in columns}
+
+# Process-wide TTL cache for aggregate queries polled by dashboards and health probes.
+# These tolerate a few seconds of staleness; writes that change a cached count drop its entry.
+_AGGREGATE_TTL = 5.0 # seconds
+_ttl_cache: Dict[str, Tuple[float, Any]] = {}
+_ttl_locks: Dict[str, asyncio.Lock] = {}
+
+def _ttl_cached(ttl: float = _AGGREGATE_TTL, cache_if: Optional[Callable[[Any], bool]] = None):
+    """
+    Memoize a no-argument coroutine for `ttl` seconds; concurrent misses share one query.
+    Results rejected by `cache_if` (e.g. a failed probe) are returned but not stored.
+    """
+    def decorator(fn):
+        key = fn.__name__
+
+        @functools.wraps(fn)
+        async def wrapper():
+            entry = _ttl_cache.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            async with _ttl_locks.setdefault(key, asyncio.Lock()):
+                entry = _ttl_cache.get(key) # another waiter may have refreshed it
+                if entry is not None and entry[0] > time.monotonic():
+                    return entry[1]
+                value = await fn()
+                if cache_if is None or cache_if(value):
+                    _ttl_cache[key] = (time.monotonic() + ttl, value)
+                return value
+        return wrapper
+    return decorator
+
+def _ttl_invalidate(*keys: str) -> None:
+    for key in keys:
+        _ttl_cache.pop(key, None)
+
+# Per-request identity cache for *_by_id lookups. Disabled (None) unless the caller opens a
+# request_cache_scope(), so long-lived code paths never see stale rows.
+_request_cache: ContextVar[Optional[Dict[Tuple[type, str], Any]]] = ContextVar(
+    'vision_wagon_request_cache', default=None
+)
+
+@contextmanager
+def request_cache_scope():
+    """
+    Cache *_by_id lookups for the enclosed unit of work (typically one HTTP request).
+    Wrap the request handler, e.g. from a middleware: `with request_cache_scope(): ...`
+    """
+    token = _request_cache.set({})
+    try:
+        yield
+    finally:
+        _request_cache.reset(token)
+
+# Process-wide LRU for read-heavy, write-rare rows (agent configs, avatar personalities), layered
+# under the request cache. Writers NOTIFY _CACHE_CHANNEL so every worker drops its copy.
+# Entries are deep-copied column values, never the ORM instance itself: each hit gets its own object.
+_SHARED_CACHE_MAXSIZE = 4096
+_CACHE_CHANNEL = 'cache_invalidate'
+_shared_cache: 'OrderedDict[Tuple[type, str], Dict[str, Any]]' = OrderedDict()
+_shared_cache_enabled = False # set by DatabaseManager once invalidation is guaranteed
+# Bumped by every invalidation. A read that started before one may hold the old row, so
+# _cache_put only stores it in the shared cache if the epoch is unchanged.
+_shared_cache_epoch = 0
+
+_SHARED_CACHE_MODELS: Dict[str, type] = {
+    Agent.__tablename__: Agent,
+    AvatarPersonality.__tablename__: AvatarPersonality,
+}
+
+def _on_cache_notification(connection, pid, channel, payload: str) -> None:
+    """asyncpg listener callback; payload is '<table>:<key>'."""
+    global _shared_cache_epoch
+    table, _, key = payload.partition(':')
+    model = _SHARED_CACHE_MODELS.get(table)
+    if model is not None:
+        _shared_cache_epoch += 1
+        _shared_cache.pop((model, key), None)
+
+async def _notify_invalidate(session: AsyncSession, model: type, key: Any) -> None:
+    """Tell other workers to drop `key`; delivered by PostgreSQL when the write commits."""
+    if session.bind.dialect.name == 'postgresql':
+        await session.execute(select(func.pg_notify(_CACHE_CHANNEL, f'{model.__tablename__}:{key}')))
+
+def _cache_get(model: type, key: Any) -> Any:
+    cache_key = (model, str(key))
+    cache = _request_cache.get()
+    obj = cache.get(cache_key) if cache is not None else None
+    if obj is None and _shared_cache_enabled and model in _SHARED_CACHE_MODELS.values():
+        values = _shared_cache.get(cache_key)
+        if values is not None:
+            _shared_cache.move_to_end(cache_key)
+            # A fresh detached instance per hit, so one caller's mutation never leaks into another's read
+            obj = model(**copy.deepcopy(values))
+            make_transient_to_detached(obj)
+            if cache is not None:
+                cache[cache_key] = obj
+    return obj
+
+def _cache_put(model: type, key: Any, obj: Any, epoch: Optional[int] = None) -> None:
+    """Cache a row just read; `epoch` is _shared_cache_epoch as it was before the read started."""
+    if obj is None:
+        return
+    cache_key = (model, str(key))
+    cache = _request_cache.get()
+    if cache is not None:
+        cache[cache_key] = obj
+    if (_shared_cache_enabled and epoch == _shared_cache_epoch
+            and model in _SHARED_CACHE_MODELS.values()):
+        _shared_cache[cache_key] = copy.deepcopy({k: getattr(obj, k) for k in model.dto_class().__slots__})
+        _shared_cache.move_to_end(cache_key)
+        if len(_shared_cache) > _SHARED_CACHE_MAXSIZE:
+            _shared_cache.popitem(last=False)
+
+def _cache_invalidate(model: type, key: Any) -> None:
+    """Drop `key` from both caches; call it after the write has committed."""
+    global _shared_cache_epoch
+    cache_key = (model, str(key))
+    cache = _request_cache.get()
+    if cache is not None:
+        cache.pop(cache_key, None)
+    _shared_cache_epoch += 1
+    _shared_cache.pop(cache_key, None)
 
 # Agent Operations
 async def get_agents(
@@ -136,64 +617,70 @@ async def get_agents(
     offset: Optional[int] = None
 ) -> List[Agent]:
     """Get agents with optional filtering and pagination."""
-    async with db_manager.get_session() as session:
-        stmt = select(Agent)
-        if status:
-            stmt = stmt.where(Agent.status == status)
-        if agent_type:
-            stmt = stmt.where(Agent.agent_type == agent_type)
-
-        stmt = stmt.order_by(desc(Agent.created_at)) # Explicit desc
-
-        if offset is not None: # Check for None explicitly
-            stmt = stmt.offset(offset)
-        if limit is not None: # Check for None explicitly
-            stmt = stmt.limit(limit)
-
+    filters = []
+    if status:
+        filters.append(lambda s: s.where(Agent.status == status))
+    if agent_type:
+        filters.append(lambda s: s.where(Agent.agent_type == agent_type))
+    stmt = lambda_stmt(lambda: select(Agent).order_by(desc(Agent.created_at))) # Explicit desc
+    stmt = _apply_steps(stmt, filters, limit, offset)
+
+    async with get_db_manager().get_read_session() as session:
         result = await session.execute(stmt)
         return result.scalars().all()
 
+# Single-key lookups are built once with bind parameters: the same SQL text on every call keeps the
+# compiled form and each connection's prepared statement warm.
+# In Agent model, agent_id is the unique human-readable ID, not the UUID 'id' field.
+_AGENT_BY_ID_STMT = select(Agent).where(Agent.agent_id == bindparam('agent_id'))
+
 async def get_agent_by_id(agent_id: str) -> Optional[Agent]:
     """Get agent by ID."""
-    async with db_manager.get_session() as session:
-        # In Agent model, agent_id is the unique human-readable ID, not the UUID 'id' field.
-        stmt = select(Agent).where(Agent.agent_id == agent_id)
-        result = await session.execute(stmt)
-        return result.scalar_one_or_none()
+    cached = _cache_get(Agent, agent_id)
+    if cached is not None:
+        return cached
+    epoch = _shared_cache_epoch
+    async with get_db_manager().get_read_session() as session:
+        result = await session.execute(_AGENT_BY_ID_STMT, {'agent_id': agent_id})
+        agent = result.scalar_one_or_none()
+    _cache_put(Agent, agent_id, agent, epoch)
+    return agent
 
 async def create_agent(agent_data: Dict[str, Any]) -> Agent:
     """Create a new agent."""
-    async with db_manager.get_session() as session:
-        agent = Agent(**agent_data)
-        session.add(agent)
-        # Commit is handled by context manager, flush and refresh are good for getting generated values
-        await session.flush()
-        await session.refresh(agent)
-        return agent
+    async with get_db_manager().get_write_session() as session:
+        return await _insert_returning(session, Agent, agent_data)
 
 async def update_agent(agent_id: str, updates: Dict[str, Any]) -> Optional[Agent]:
     """Update an existing agent."""
-    async with db_manager.get_session() as session:
+    async with get_db_manager().get_write_session() as session:
         # In Agent model, agent_id is the unique human-readable ID.
-        stmt = select(Agent).where(Agent.agent_id == agent_id)
-        result = await session.execute(stmt)
-        agent = result.scalar_one_or_none()
-
-        if not agent:
-            return None
-
-        for field, value in updates.items():
-            if hasattr(agent, field):
-                setattr(agent, field, value)
-
-        # agent.updated_at is likely handled by onupdate=datetime.utcnow in model
-        # If not, uncomment:
-        # agent.updated_at = datetime.utcnow()
-        await session.flush()
-        await session.refresh(agent)
-        return agent
+        # updated_at is refreshed by the column's onupdate default.
+        agent = await _update_returning(
+            session, Agent, Agent.agent_id == agent_id, _column_values(Agent, updates)
+        )
+        if agent is not None:
+            await _notify_invalidate(session, Agent, agent_id)
+    if agent is not None:
+        # Only after COMMIT: invalidating earlier lets a concurrent read cache the old row again
+        _cache_invalidate(Agent, agent_id)
+    return agent
 
 # Agent Log Operations
+def _agent_log_filters(agent_id, level, action, start_time, end_time) -> list:
+    filters = []
+    if agent_id:
+        filters.append(lambda s: s.where(AgentLog.agent_id == agent_id)) # agent_id is string in AgentLog
+    if level:
+        filters.append(lambda s: s.where(AgentLog.level == level))
+    if action:
+        filters.append(lambda s: s.where(AgentLog.action == action))
+    if start_time:
+        filters.append(lambda s: s.where(AgentLog.timestamp >= start_time))
+    if end_time:
+        filters.append(lambda s: s.where(AgentLog.timestamp <= end_time))
+    return filters
+
 async def get_agent_logs(
     agent_id: Optional[str] = None,
     level: Optional[str] = None,
@@ -203,49 +690,102 @@ async def get_agent_logs(
     limit: Optional[int] = None,
     offset: Optional[int] = None
 ) -> List[AgentLog]:
-    async with db_manager.get_session() as session:
-        stmt = select(AgentLog).options(joinedload(AgentLog.agent))
-        conditions = []
-        if agent_id:
-            conditions.append(AgentLog.agent_id == agent_id) # agent_id is string in AgentLog
-        if level:
-            conditions.append(AgentLog.level == level)
-        if action:
-            conditions.append(AgentLog.action == action)
-        if start_time:
-            conditions.append(AgentLog.timestamp >= start_time)
-        if end_time:
-            conditions.append(AgentLog.timestamp <= end_time)
-
-        if conditions:
-            stmt = stmt.where(and_(*conditions))
-
-        stmt = stmt.order_by(desc(AgentLog.timestamp))
-
-        if offset is not None:
-            stmt = stmt.offset(offset)
-        if limit is not None:
-            stmt = stmt.limit(limit)
-
+    stmt = lambda_stmt(
+        lambda: select(AgentLog)
+        .options(selectinload(AgentLog.agent), raiseload('*')) # keep the paginated query on agent_logs alone
+        .order_by(desc(AgentLog.timestamp))
+    )
+    stmt = _apply_steps(stmt, _agent_log_filters(agent_id, level, action, start_time, end_time), limit, offset)
+
+    async with get_db_manager().get_read_session() as session:
         result = await session.execute(stmt)
         return result.scalars().all()
 
+async def get_agent_logs_json(
+    agent_id: Optional[str] = None,
+    level: Optional[str] = None,
+    action: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None
+) -> bytes:
+    """Agent logs serialized to JSON straight from Core rows (no ORM objects)."""
+    filters = _agent_log_filters(agent_id, level, action, start_time, end_time)
+    return await _select_rows_json(AgentLog.__table__, filters, AgentLog.timestamp, limit, offset)
+
+async def stream_agent_logs(
+    agent_id: Optional[str] = None,
+    level: Optional[str] = None,
+    action: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None
+) -> AsyncIterator[AgentLog]:
+    """Like get_agent_logs without limit, but streamed; for exporters and log shippers."""
+    stmt = lambda_stmt(lambda: select(AgentLog).options(raiseload('*')).order_by(desc(AgentLog.timestamp)))
+    stmt = _apply_steps(stmt, _agent_log_filters(agent_id, level, action, start_time, end_time))
+    async for log in _stream_scalars(stmt):
+        yield log
+
 async def create_agent_log(log_data: Dict[str, Any]) -> AgentLog:
-    async with db_manager.get_session() as session:
-        log_entry = AgentLog(**log_data)
-        session.add(log_entry)
-        await session.flush()
-        await session.refresh(log_entry)
-        return log_entry
+    return (await create_agent_logs([log_data]))[0]
 
-async def cleanup_old_logs(days_to_keep: int = 30) -> int:
-    async with db_manager.get_session() as session:
-        cutoff_date = datetime.utcnow() - timedelta(days=days_to_keep)
-        stmt = delete(AgentLog).where(AgentLog.timestamp < cutoff_date)
-        result = await session.execute(stmt)
-        deleted_count = result.rowcount
-        logger.info(f"Cleaned up {deleted_count} old agent log entries")
-        return deleted_count
+async def create_agent_logs(logs_data: List[Dict[str, Any]]) -> List[AgentLog]:
+    """Insert many log entries in one session and one batched statement."""
+    async with get_db_manager().get_write_session() as session:
+        return await _insert_many_returning(session, AgentLog, logs_data)
+
+_CLEANUP_BATCH_SIZE = 10_000 # rows per DELETE transaction; keeps locks and WAL per commit small
+
+async def _drop_expired_partitions(session: AsyncSession, table, cutoff: datetime) -> int:
+    """Drop monthly partitions that end before `cutoff`; returns how many rows they held."""
+    result = await session.execute(_PARTITIONS_STMT, {'table': table.name})
+    dropped = 0
+    for name in result.scalars().all():
+        try:
+            month = datetime.strptime(name[len(table.name) + 1:], '%Y_%m')
+        except ValueError: # <table>_default or a partition not created by ensure_partitions
+            continue
+        if _add_months(month, 1) <= cutoff:
+            dropped += await session.scalar(text(f'SELECT count(*) FROM "{name}"'))
+            await session.execute(text(f'DROP TABLE "{name}"'))
+    return dropped
+
+async def cleanup_old_logs(days_to_keep: int = 30, batch_size: int = _CLEANUP_BATCH_SIZE) -> int:
+    cutoff_date = datetime.utcnow() - timedelta(days=days_to_keep)
+    db = get_db_manager()
+    await db._ensure_session_factory() # the engine (and its dialect) only exist once initialized
+    deleted_count = 0
+    if db.engine.dialect.name == 'postgresql':
+        # Whole months past the cutoff go in O(1) with DROP; the batched DELETE below only has
+        # to handle the partially expired month (and the default partition).
+        async with db.get_write_session() as session:
+            deleted_count += await _drop_expired_partitions(session, AgentLog.__table__, cutoff_date)
+        await db.ensure_partitions() # periodic maintenance also keeps future partitions in place
+
+    # Delete by primary key in bounded batches, one committed transaction each, instead of one
+    # unbounded DELETE that holds locks on the whole range and blocks concurrent log writers.
+    batch_ids = (
+        select(AgentLog.id)
+        .where(AgentLog.timestamp < cutoff_date)
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    stmt = (
+        delete(AgentLog)
+        .where(AgentLog.id.in_(batch_ids), AgentLog.timestamp < cutoff_date) # timestamp prunes partitions
+        .execution_options(synchronize_session=False)
+    )
+
+    while True:
+        async with db.get_write_session() as session:
+            result = await session.execute(stmt)
+        deleted_count += result.rowcount
+        if result.rowcount < batch_size:
+            break
+        await asyncio.sleep(0) # let other sessions make progress between batches
+    logger.info(f"Cleaned up {deleted_count} old agent log entries")
+    return deleted_count
 
 # Campaign Operations
 async def get_campaigns(
@@ -254,36 +794,39 @@ async def get_campaigns(
     limit: Optional[int] = None,
     offset: Optional[int] = None
 ) -> List[Campaign]:
-    async with db_manager.get_session() as session:
-        stmt = select(Campaign)
-        if status:
-            stmt = stmt.where(Campaign.status == status)
-        if campaign_type:
-            stmt = stmt.where(Campaign.campaign_type == campaign_type)
-        stmt = stmt.order_by(desc(Campaign.created_at))
-        if offset is not None:
-            stmt = stmt.offset(offset)
-        if limit is not None:
-            stmt = stmt.limit(limit)
+    filters = []
+    if status:
+        filters.append(lambda s: s.where(Campaign.status == status))
+    if campaign_type:
+        filters.append(lambda s: s.where(Campaign.campaign_type == campaign_type))
+    stmt = lambda_stmt(lambda: select(Campaign).order_by(desc(Campaign.created_at)))
+    stmt = _apply_steps(stmt, filters, limit, offset)
+    async with get_db_manager().get_read_session() as session:
         result = await session.execute(stmt)
         return result.scalars().all()
 
+# One round trip for the campaign and both collections; raiseload('*') makes any other
+# relationship access fail fast instead of silently issuing another query.
+_CAMPAIGN_BY_ID_STMT = select(Campaign).options(
+    joinedload(Campaign.tasks),
+    joinedload(Campaign.contents), # contents, not content per model
+    raiseload('*')
+).where(Campaign.id == bindparam('campaign_id')) # Use 'id' for UUID PK
+
 async def get_campaign_by_id(campaign_id: str) -> Optional[Campaign]: # campaign_id is UUID in model
-    async with db_manager.get_session() as session:
-        stmt = select(Campaign).options(
-            selectinload(Campaign.tasks),
-            selectinload(Campaign.contents) # contents, not content per model
-        ).where(Campaign.id == campaign_id) # Use 'id' for UUID PK
-        result = await session.execute(stmt)
-        return result.scalar_one_or_none()
+    cached = _cache_get(Campaign, campaign_id)
+    if cached is not None:
+        return cached
+    async with get_db_manager().get_read_session() as session:
+        result = await session.execute(_CAMPAIGN_BY_ID_STMT, {'campaign_id': campaign_id})
+        # Two joined collections multiply rows (tasks x contents); unique() collapses them.
+        campaign = result.unique().scalar_one_or_none()
+    _cache_put(Campaign, campaign_id, campaign)
+    return campaign
 
 async def create_campaign(campaign_data: Dict[str, Any]) -> Campaign:
-    async with db_manager.get_session() as session:
-        campaign = Campaign(**campaign_data)
-        session.add(campaign)
-        await session.flush()
-        await session.refresh(campaign)
-        return campaign
+    async with get_db_manager().get_write_session() as session:
+        return await _insert_returning(session, Campaign, campaign_data)
 
 # Task Operations
 async def get_tasks(
@@ -295,77 +838,77 @@ async def get_tasks(
     limit: Optional[int] = None,
     offset: Optional[int] = None
 ) -> List[Task]:
-    async with db_manager.get_session() as session:
-        stmt = select(Task).options(
-            joinedload(Task.agent),
-            joinedload(Task.campaign)
-        )
-        conditions = []
-        if status:
-            conditions.append(Task.status == status)
-        if task_type:
-            conditions.append(Task.task_type == task_type)
-        if agent_id:
-            conditions.append(Task.agent_id == agent_id)
-        if campaign_id:
-            conditions.append(Task.campaign_id == campaign_id)
-        if priority is not None: # Priority can be 0
-            conditions.append(Task.priority == priority)
-
-        if conditions:
-            stmt = stmt.where(and_(*conditions))
-
-        stmt = stmt.order_by(
+    filters = []
+    if status:
+        filters.append(lambda s: s.where(Task.status == status))
+    if task_type:
+        filters.append(lambda s: s.where(Task.task_type == task_type))
+    if agent_id:
+        filters.append(lambda s: s.where(Task.agent_id == agent_id))
+    if campaign_id:
+        filters.append(lambda s: s.where(Task.campaign_id == campaign_id))
+    if priority is not None: # Priority can be 0
+        filters.append(lambda s: s.where(Task.priority == priority))
+
+    stmt = lambda_stmt(
+        lambda: select(Task)
+        .options(selectinload(Task.agent), selectinload(Task.campaign), raiseload('*')) # one IN (...) batch per relation
+        .order_by(
             desc(Task.priority), # Higher priority first
             desc(Task.created_at)
         )
+    )
+    stmt = _apply_steps(stmt, filters, limit, offset)
 
-        if offset is not None:
-            stmt = stmt.offset(offset)
-        if limit is not None:
-            stmt = stmt.limit(limit)
-
+    async with get_db_manager().get_read_session() as session:
         result = await session.execute(stmt)
         return result.scalars().all()
 
+_TASK_BY_ID_STMT = select(Task).options(
+    joinedload(Task.agent),
+    joinedload(Task.campaign),
+    raiseload('*')
+).where(Task.id == bindparam('task_id')) # Use 'id' for UUID PK
+
 async def get_task_by_id(task_id: str) -> Optional[Task]: # task_id is UUID in model
-    async with db_manager.get_session() as session:
-        stmt = select(Task).options(
-            joinedload(Task.agent),
-            joinedload(Task.campaign)
-        ).where(Task.id == task_id) # Use 'id' for UUID PK
-        result = await session.execute(stmt)
-        return result.scalar_one_or_none()
+    cached = _cache_get(Task, task_id)
+    if cached is not None:
+        return cached
+    async with get_db_manager().get_read_session() as session:
+        result = await session.execute(_TASK_BY_ID_STMT, {'task_id': task_id})
+        task = result.scalar_one_or_none()
+    _cache_put(Task, task_id, task)
+    return task
 
 async def create_task(task_data: Dict[str, Any]) -> Task:
-    async with db_manager.get_session() as session:
-        task = Task(**task_data)
-        session.add(task)
-        await session.flush()
-        await session.refresh(task)
-        return task
+    async with get_db_manager().get_write_session() as session:
+        task = await _insert_returning(session, Task, task_data)
+    _ttl_invalidate('get_task_queue_size')
+    return task
+
+async def create_task_with_log(task_data: Dict[str, Any], log_data: Dict[str, Any]) -> Tuple[Task, AgentLog]:
+    """Create a task and its log entry in one session: one transaction and one COMMIT instead of two."""
+    # A session/connection runs one statement at a time (asyncpg rejects concurrent operations on a
+    # connection), so the INSERTs are issued back to back inside the same transaction.
+    async with get_db_manager().get_write_session() as session:
+        task = await _insert_returning(session, Task, task_data)
+        log = await _insert_returning(session, AgentLog, log_data)
+    _ttl_invalidate('get_task_queue_size')
+    return task, log
 
 async def update_task_status(task_id: str, status: str, task_result: Optional[Dict[str, Any]] = None) -> Optional[Task]: # task_id is UUID
-    async with db_manager.get_session() as session:
-        stmt = select(Task).where(Task.id == task_id) # Use 'id' for UUID PK
-        result_obj = await session.execute(stmt)
-        task = result_obj.scalar_one_or_none()
-
-        if not task:
-            return None
-
-        task.status = status
-        # task.updated_at handled by onupdate in model
-
-        if task_result is not None: # Check for None explicitly
-            task.output_data = task_result # Assuming result goes into output_data
-
-        if status in ['COMPLETED', 'FAILED', 'CANCELLED']: # String values from Enum
-            task.completed_at = datetime.utcnow()
-
-        await session.flush()
-        await session.refresh(task)
-        return task
+    values: Dict[str, Any] = {'status': status} # updated_at handled by onupdate in model
+    if task_result is not None: # Check for None explicitly
+        values['output_data'] = task_result # Assuming result goes into output_data
+    if status in ['COMPLETED', 'FAILED', 'CANCELLED']: # String values from Enum
+        values['completed_at'] = utcnow() # server clock, same as created_at/updated_at
+
+    async with get_db_manager().get_write_session() as session:
+        task = await _update_returning(session, Task, Task.id == task_id, values) # Use 'id' for UUID PK
+    if task is not None:
+        _cache_invalidate(Task, task_id)
+        _ttl_invalidate('get_task_queue_size')
+    return task
 
 # Content Operations
 async def get_content_list( # Renamed from get_content to avoid conflict with single get_content_by_id
@@ -375,108 +918,151 @@ async def get_content_list( # Renamed from get_content to avoid conflict with si
     limit: Optional[int] = None,
     offset: Optional[int] = None
 ) -> List[Content]:
-    async with db_manager.get_session() as session:
-        stmt = select(Content).options(joinedload(Content.campaign))
-        conditions = []
-        if content_type:
-            conditions.append(Content.content_type == content_type)
-        if status:
-            conditions.append(Content.status == status)
-        if campaign_id:
-            conditions.append(Content.campaign_id == campaign_id)
-
-        if conditions:
-            stmt = stmt.where(and_(*conditions))
-
-        stmt = stmt.order_by(desc(Content.created_at))
-
-        if offset is not None:
-            stmt = stmt.offset(offset)
-        if limit is not None:
-            stmt = stmt.limit(limit)
-
+    filters = []
+    if content_type:
+        filters.append(lambda s: s.where(Content.content_type == content_type))
+    if status:
+        filters.append(lambda s: s.where(Content.status == status))
+    if campaign_id:
+        filters.append(lambda s: s.where(Content.campaign_id == campaign_id))
+
+    stmt = lambda_stmt(
+        lambda: select(Content)
+        .options(selectinload(Content.campaign), raiseload('*'))
+        .order_by(desc(Content.created_at))
+    )
+    stmt = _apply_steps(stmt, filters, limit, offset)
+
+    async with get_db_manager().get_read_session() as session:
         result = await session.execute(stmt)
         return result.scalars().all()
 
+_CONTENT_BY_ID_STMT = select(Content).where(Content.id == bindparam('content_id')) # Use 'id' for UUID PK
+
 async def get_content_by_id(content_id: str) -> Optional[Content]: # content_id is UUID
     """Get content by ID."""
-    async with db_manager.get_session() as session:
-        stmt = select(Content).where(Content.id == content_id) # Use 'id' for UUID PK
-        result = await session.execute(stmt)
-        return result.scalar_one_or_none()
+    cached = _cache_get(Content, content_id)
+    if cached is not None:
+        return cached
+    async with get_db_manager().get_read_session() as session:
+        result = await session.execute(_CONTENT_BY_ID_STMT, {'content_id': content_id})
+        content = result.scalar_one_or_none()
+    _cache_put(Content, content_id, content)
+    return content
 
 async def create_content(content_data: Dict[str, Any]) -> Content:
-    async with db_manager.get_session() as session:
-        content = Content(**content_data)
-        session.add(content)
-        await session.flush()
-        await session.refresh(content)
-        return content
+    async with get_db_manager().get_write_session() as session:
+        return await _insert_returning(session, Content, content_data)
 
 async def update_content(content_id: str, updates: Dict[str, Any]) -> Optional[Content]: # content_id is UUID
-    async with db_manager.get_session() as session:
-        stmt = select(Content).where(Content.id == content_id) # Use 'id' for UUID PK
-        result = await session.execute(stmt)
-        content = result.scalar_one_or_none()
-
-        if not content:
-            return None
-
-        for field, value in updates.items():
-            if field == 'content_metadata' and content.content_metadata and isinstance(value, dict):
-                merged_metadata = {**content.content_metadata, **value}
-                setattr(content, field, merged_metadata)
-            elif hasattr(content, field):
-                setattr(content, field, value)
+    values = _column_values(Content, updates)
+    async with get_db_manager().get_write_session() as session:
+        if isinstance(values.get('content_metadata'), dict) and session.bind.dialect.name == 'postgresql':
+            # Metadata is merged into the stored dict rather than replaced: jsonb || jsonb in the UPDATE itself.
+            # A stored null, scalar or array is replaced (|| would turn it into an array), as on other dialects.
+            stored = case(
+                (func.jsonb_typeof(Content.content_metadata) == 'object', Content.content_metadata),
+                else_=cast({}, JSONB),
+            )
+            values['content_metadata'] = stored.op('||')(cast(values['content_metadata'], JSONB))
+        elif isinstance(values.get('content_metadata'), dict):
+            # Other dialects have no JSON merge operator, so read the current value first.
+            current = await session.execute(select(Content.content_metadata).where(Content.id == content_id))
+            row = current.one_or_none()
+            if row is None:
+                return None
+            if isinstance(row.content_metadata, dict):
+                values['content_metadata'] = {**row.content_metadata, **values['content_metadata']}
 
         # content.updated_at handled by onupdate
-        await session.flush()
-        await session.refresh(content)
-        return content
+        content = await _update_returning(session, Content, Content.id == content_id, values) # Use 'id' for UUID PK
+    if content is not None:
+        _cache_invalidate(Content, content_id)
+    return content
 
 # Security Event Operations
+def _security_event_filters(event_type, severity, start_time, end_time, resolved=None) -> list:
+    filters = []
+    if resolved is not None:
+        # Literal true/false rather than a bind parameter, so PostgreSQL can prove the predicate of
+        # the ix_security_events_open partial index even under a cached generic plan.
+        if resolved:
+            filters.append(lambda s: s.where(SecurityEvent.resolved == true()))
+        else:
+            filters.append(lambda s: s.where(SecurityEvent.resolved == false()))
+    if event_type:
+        filters.append(lambda s: s.where(SecurityEvent.event_type == event_type))
+    if severity:
+        filters.append(lambda s: s.where(SecurityEvent.severity == severity))
+    if start_time:
+        filters.append(lambda s: s.where(SecurityEvent.timestamp >= start_time))
+    if end_time:
+        filters.append(lambda s: s.where(SecurityEvent.timestamp <= end_time))
+    return filters
+
 async def get_security_events(
     event_type: Optional[str] = None,
     severity: Optional[str] = None,
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
+    resolved: Optional[bool] = None,
     limit: Optional[int] = None,
     offset: Optional[int] = None
 ) -> List[SecurityEvent]:
-    async with db_manager.get_session() as session:
-        stmt = select(SecurityEvent)
-        conditions = []
-        if event_type:
-            conditions.append(SecurityEvent.event_type == event_type)
-        if severity:
-            conditions.append(SecurityEvent.severity == severity)
-        if start_time:
-            conditions.append(SecurityEvent.timestamp >= start_time)
-        if end_time:
-            conditions.append(SecurityEvent.timestamp <= end_time)
-
-        if conditions:
-            stmt = stmt.where(and_(*conditions))
-
-        stmt = stmt.order_by(desc(SecurityEvent.timestamp))
-
-        if offset is not None:
-            stmt = stmt.offset(offset)
-        if limit is not None:
-            stmt = stmt.limit(limit)
+    stmt = lambda_stmt(lambda: select(SecurityEvent).order_by(desc(SecurityEvent.timestamp)))
+    stmt = _apply_steps(stmt, _security_event_filters(event_type, severity, start_time, end_time, resolved), limit, offset)
 
+    async with get_db_manager().get_read_session() as session:
         result = await session.execute(stmt)
         return result.scalars().all()
 
+async def get_security_events_json(
+    event_type: Optional[str] = None,
+    severity: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    resolved: Optional[bool] = None,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None
+) -> bytes:
+    """Security events serialized to JSON straight from Core rows (no ORM objects)."""
+    filters = _security_event_filters(event_type, severity, start_time, end_time, resolved)
+    return await _select_rows_json(SecurityEvent.__table__, filters, SecurityEvent.timestamp, limit, offset)
+
+async def stream_security_events(
+    event_type: Optional[str] = None,
+    severity: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    resolved: Optional[bool] = None
+) -> AsyncIterator[SecurityEvent]:
+    """Like get_security_events without limit, but streamed from a server-side cursor."""
+    stmt = lambda_stmt(lambda: select(SecurityEvent).order_by(desc(SecurityEvent.timestamp)))
+    stmt = _apply_steps(stmt, _security_event_filters(event_type, severity, start_time, end_time, resolved))
+    async for event in _stream_scalars(stmt):
+        yield event
+
 async def create_security_event(event_data: Dict[str, Any]) -> SecurityEvent:
-    async with db_manager.get_session() as session:
-        event = SecurityEvent(**event_data)
-        session.add(event)
-        await session.flush()
-        await session.refresh(event)
-        return event
+    return (await create_security_events([event_data]))[0]
+
+async def create_security_events(events_data: List[Dict[str, Any]]) -> List[SecurityEvent]:
+    """Insert many security events in one session and one batched statement."""
+    async with get_db_manager().get_write_session() as session:
+        return await _insert_many_returning(session, SecurityEvent, events_data)
 
 # Metrics Operations
+def _metric_filters(metric_name, metric_type, start_time, end_time) -> list:
+    filters = []
+    if metric_name:
+        filters.append(lambda s: s.where(SystemMetric.metric_name == metric_name))
+    if metric_type:
+        filters.append(lambda s: s.where(SystemMetric.metric_type == metric_type))
+    if start_time:
+        filters.append(lambda s: s.where(SystemMetric.timestamp >= start_time))
+    if end_time:
+        filters.append(lambda s: s.where(SystemMetric.timestamp <= end_time))
+    return filters
+
 async def get_metrics(
     metric_name: Optional[str] = None,
     metric_type: Optional[str] = None,
@@ -485,109 +1071,135 @@ async def get_metrics(
     limit: Optional[int] = None,
     offset: Optional[int] = None
 ) -> List[SystemMetric]:
-    async with db_manager.get_session() as session:
-        stmt = select(SystemMetric)
-        conditions = []
-        if metric_name:
-            conditions.append(SystemMetric.metric_name == metric_name)
-        if metric_type:
-            conditions.append(SystemMetric.metric_type == metric_type)
-        if start_time:
-            conditions.append(SystemMetric.timestamp >= start_time)
-        if end_time:
-            conditions.append(SystemMetric.timestamp <= end_time)
-
-        if conditions:
-            stmt = stmt.where(and_(*conditions))
-
-        stmt = stmt.order_by(desc(SystemMetric.timestamp))
-
-        if offset is not None:
-            stmt = stmt.offset(offset)
-        if limit is not None:
-            stmt = stmt.limit(limit)
+    stmt = lambda_stmt(lambda: select(SystemMetric).order_by(desc(SystemMetric.timestamp)))
+    stmt = _apply_steps(stmt, _metric_filters(metric_name, metric_type, start_time, end_time), limit, offset)
 
+    async with get_db_manager().get_read_session() as session:
         result = await session.execute(stmt)
         return result.scalars().all()
 
-async def create_metric(metric_data: Dict[str, Any]) -> SystemMetric:
-    async with db_manager.get_session() as session:
-        metric = SystemMetric(**metric_data)
-        session.add(metric)
-        await session.flush()
-        await session.refresh(metric)
-        return metric
-
-# Optimized System Stats
-async def get_system_stats() -> Dict[str, Any]:
-    async with db_manager.get_session() as session:
-        agent_stats_stmt = select(Agent.status, func.count(Agent.id).label('count')).group_by(Agent.status) # Use Agent.id
-        agent_result = await session.execute(agent_stats_stmt)
-        agent_stats = {row.status: row.count for row in agent_result.all()} # Use .all() for named tuples
+async def get_metrics_json(
+    metric_name: Optional[str] = None,
+    metric_type: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None
+) -> bytes:
+    """Metrics serialized to JSON straight from Core rows (no ORM objects)."""
+    filters = _metric_filters(metric_name, metric_type, start_time, end_time)
+    return await _select_rows_json(SystemMetric.__table__, filters, SystemMetric.timestamp, limit, offset)
 
-        task_stats_stmt = select(Task.status, func.count(Task.id).label('count')).group_by(Task.status) # Use Task.id
-        task_result = await session.execute(task_stats_stmt)
-        task_stats = {row.status: row.count for row in task_result.all()}
+async def stream_metrics(
+    metric_name: Optional[str] = None,
+    metric_type: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None
+) -> AsyncIterator[SystemMetric]:
+    """Like get_metrics without limit, but streamed from a server-side cursor."""
+    stmt = lambda_stmt(lambda: select(SystemMetric).order_by(desc(SystemMetric.timestamp)))
+    stmt = _apply_steps(stmt, _metric_filters(metric_name, metric_type, start_time, end_time))
+    async for metric in _stream_scalars(stmt):
+        yield metric
 
-        campaign_stats_stmt = select(Campaign.status, func.count(Campaign.id).label('count')).group_by(Campaign.status) # Use Campaign.id
-        campaign_result = await session.execute(campaign_stats_stmt)
-        campaign_stats = {row.status: row.count for row in campaign_result.all()}
+async def create_metric(metric_data: Dict[str, Any]) -> SystemMetric:
+    return (await create_metrics([metric_data]))[0]
 
-        content_stats_stmt = select(Content.status, func.count(Content.id).label('count')).group_by(Content.status) # Use Content.id
-        content_result = await session.execute(content_stats_stmt)
-        content_stats = {row.status: row.count for row in content_result.all()}
+async def create_metrics(metrics_data: List[Dict[str, Any]]) -> List[SystemMetric]:
+    """Insert many metrics and return the rows; use bulk_insert_metrics when rows aren't needed back."""
+    async with get_db_manager().get_write_session() as session:
+        return await _insert_many_returning(session, SystemMetric, metrics_data)
 
+# Optimized System Stats
+_STATS_TOTAL_KEY = '__total__'
+
+def _build_system_stats_statement():
+    """One UNION ALL over every stats source: (kind, key, count) rows plus a total row per kind.
+
+    The 24h cutoff is a bound parameter, so the statement is built (and its compiled form
+    cached) once for the process instead of on every call.
+    """
+    cutoff = bindparam('cutoff_time')
+    sources = (
+        ('agents', Agent.status, Agent.id, None),
+        ('tasks', Task.status, Task.id, None),
+        ('campaigns', Campaign.status, Campaign.id, None),
+        ('content', Content.status, Content.id, None),
+        ('security_events_24h', SecurityEvent.severity, SecurityEvent.id, SecurityEvent.timestamp >= cutoff),
+    )
+    parts = []
+    for kind, key_col, id_col, condition in sources:
+        grouped = select(literal(kind).label('kind'), key_col.label('key'), func.count(id_col).label('count'))
+        total = select(literal(kind), literal(_STATS_TOTAL_KEY), func.count(id_col))
+        if condition is not None:
+            grouped = grouped.where(condition)
+            total = total.where(condition)
+        parts.extend((grouped.group_by(key_col), total))
+    return union_all(*parts)
+
+_SYSTEM_STATS_STMT = _build_system_stats_statement()
+
+@_ttl_cached()
+async def get_system_stats() -> Dict[str, Any]:
+    async with get_db_manager().get_read_session() as session:
         cutoff_time = datetime.utcnow() - timedelta(hours=24)
-        security_stats_stmt = select(
-            SecurityEvent.severity, func.count(SecurityEvent.id).label('count') # Use SecurityEvent.id
-        ).where(SecurityEvent.timestamp >= cutoff_time).group_by(SecurityEvent.severity)
-        security_result = await session.execute(security_stats_stmt)
-        security_stats = {row.severity: row.count for row in security_result.all()}
-
-        return {
-            'agents': agent_stats,
-            'tasks': task_stats,
-            'campaigns': campaign_stats,
-            'content': content_stats,
-            'security_events_24h': security_stats,
-            'timestamp': datetime.utcnow().isoformat()
+        result = await session.execute(_SYSTEM_STATS_STMT, {'cutoff_time': cutoff_time})
+
+        stats: Dict[str, Any] = {
+            'agents': {},
+            'tasks': {},
+            'campaigns': {},
+            'content': {},
+            'security_events_24h': {},
+            'totals': {}
         }
+        totals = stats['totals']
+        for kind, key, count in result.all():
+            if key == _STATS_TOTAL_KEY:
+                totals[kind] = count
+            else:
+                stats[kind][key] = count
+        stats['timestamp'] = datetime.utcnow().isoformat()
+        return stats
 
 # Avatar Personality Operations
-async def get_avatar_personality(avatar_id: str) -> Optional[AvatarPersonality]:
-    async with db_manager.get_session() as session:
-        stmt = select(AvatarPersonality).where(AvatarPersonality.avatar_id == avatar_id)
-        result = await session.execute(stmt)
-        return result.scalar_one_or_none()
+_AVATAR_PERSONALITY_STMT = select(AvatarPersonality).where(AvatarPersonality.avatar_id == bindparam('avatar_id'))
 
-async def update_avatar_personality(avatar_id: str, updates: Dict[str, Any]) -> Optional[AvatarPersonality]:
-    async with db_manager.get_session() as session:
-        stmt = select(AvatarPersonality).where(AvatarPersonality.avatar_id == avatar_id)
-        result = await session.execute(stmt)
+async def get_avatar_personality(avatar_id: str) -> Optional[AvatarPersonality]:
+    cached = _cache_get(AvatarPersonality, avatar_id)
+    if cached is not None:
+        return cached
+    epoch = _shared_cache_epoch
+    async with get_db_manager().get_read_session() as session:
+        result = await session.execute(_AVATAR_PERSONALITY_STMT, {'avatar_id': avatar_id})
         personality = result.scalar_one_or_none()
+    _cache_put(AvatarPersonality, avatar_id, personality, epoch)
+    return personality
 
-        if not personality:
-            # Create new if not exists, ensuring avatar_id is part of updates or passed explicitly
-            personality_data = {'avatar_id': avatar_id, **updates.get('personality_profile', {})}
-            if 'personality_profile' not in personality_data: # ensure key exists
-                 personality_data['personality_profile'] = updates
-            # personality = AvatarPersonality(**personality_data) # This might fail if updates dont match model
-            personality = AvatarPersonality(avatar_id=avatar_id, personality_profile=updates.get('personality_profile', {}))
-
-            session.add(personality)
-        else:
-            if 'personality_profile' in updates:
-                 personality.personality_profile = updates['personality_profile']
-            # personality.updated_at handled by onupdate
-
-        await session.flush()
-        await session.refresh(personality)
-        return personality
+async def update_avatar_personality(avatar_id: str, updates: Dict[str, Any]) -> Optional[AvatarPersonality]:
+    async with get_db_manager().get_write_session() as session:
+        condition = AvatarPersonality.avatar_id == avatar_id
+        values = {'personality_profile': updates['personality_profile']} if 'personality_profile' in updates else {}
+        # personality.updated_at handled by onupdate
+        personality = await _update_returning(session, AvatarPersonality, condition, values)
+
+        if personality is None:
+            # Create new if not exists
+            personality = await _insert_returning(session, AvatarPersonality, {
+                'avatar_id': avatar_id,
+                'personality_profile': updates.get('personality_profile', {}),
+            })
+
+        await _notify_invalidate(session, AvatarPersonality, avatar_id)
+    _cache_invalidate(AvatarPersonality, avatar_id) # after COMMIT, as in update_agent
+    return personality
 
 # Health Check Operations
+# Only a healthy result is cached: once the database recovers, the next probe must see it
+@_ttl_cached(cache_if=lambda result: result['status'] == 'healthy')
 async def health_check() -> Dict[str, Any]:
     try:
-        async with db_manager.get_session() as session:
+        async with get_db_manager().get_read_session() as session:
             stmt = select(func.count()).select_from(Agent) # Simpler count
             result = await session.execute(stmt)
             agent_count = result.scalar_one() # scalar_one as we expect one row
@@ -606,38 +1218,145 @@ async def health_check() -> Dict[str, Any]:
         }
 
 # Utility Functions
+_COPY_MIN_ROWS = 100 # below this, a multi-row INSERT is cheaper than setting up COPY
+_BULK_BATCH_SIZE = 10_000 # PostgreSQL batch inserts stop improving (and can regress) past ~10k rows
+_METRIC_COPY_COLUMNS = ('id', 'metric_name', 'metric_type', 'value', 'unit', 'tags', 'source', 'timestamp')
+_LOG_COPY_COLUMNS = ('id', 'agent_id', 'execution_id', 'action', 'level', 'message', 'data',
+                     'timestamp', 'execution_time', 'success')
+
+def _copy_value(column, row: Dict[str, Any], now: datetime) -> Any:
+    """Value for one COPY field. COPY bypasses column defaults, so apply them here."""
+    value = row.get(column.name)
+    if value is None:
+        if column.default is not None:
+            value = column.default.arg if column.default.is_scalar else column.default.arg(None)
+        elif column.server_default is not None and isinstance(column.type, DateTime):
+            value = now
+    if value is not None and isinstance(column.type, JSON):
+        value = _column_json_text(value) # asyncpg expects json as text
+    return value
+
+async def _copy_rows(session: AsyncSession, table, columns: tuple, rows: List[Dict[str, Any]]) -> None:
+    """Stream rows with asyncpg's COPY FROM STDIN (binary), inside the session's transaction."""
+    conn = await session.connection()
+    raw = await conn.get_raw_connection()
+    now = datetime.utcnow()
+    cols = [table.c[name] for name in columns]
+    records = [tuple(_copy_value(c, row, now) for c in cols) for row in rows]
+    await raw.driver_connection.copy_records_to_table(table.name, records=records, columns=columns)
+
+async def _bulk_insert(table, copy_columns: tuple, rows: List[Dict[str, Any]]) -> int:
+    async with get_db_manager().get_write_session() as session:
+        use_copy = len(rows) >= _COPY_MIN_ROWS and session.bind.dialect.driver == 'asyncpg'
+        # Chunk so no single statement/COPY grows past the batch-size sweet spot; all chunks
+        # share the session's transaction, so the insert stays all-or-nothing.
+        for start in range(0, len(rows), _BULK_BATCH_SIZE):
+            batch = rows[start:start + _BULK_BATCH_SIZE]
+            if use_copy:
+                await _copy_rows(session, table, copy_columns, batch)
+            else:
+                # Core executemany: the engine's insertmanyvalues pages it into multi-row INSERTs,
+                # keeping each statement under the driver's bind-parameter limit.
+                await session.execute(insert(table), batch)
+    # rowcount is unreliable for multi-row inserts/COPY; report the number of rows sent.
+    return len(rows)
+
 async def bulk_insert_metrics(metrics_data: List[Dict[str, Any]]) -> int:
+    """Ingest metric rows: COPY on asyncpg for large batches, Core executemany otherwise.
+    There is no unique constraint on SystemMetric, so duplicates are the caller's concern."""
     if not metrics_data:
         return 0
-    async with db_manager.get_session() as session:
-        # For PostgreSQL, on_conflict_do_nothing is efficient.
-        # For other DBs, this might need adjustment or be less performant.
-        # Ensure your SystemMetric model has appropriate unique constraints for conflict to work.
-        stmt = insert(SystemMetric).values(metrics_data)
-        # Assuming a unique constraint on (metric_name, timestamp, source, tags_hash_if_any)
-        # For simplicity, if no such constraint, remove on_conflict or handle per DB.
-        # For generic solution, might need to query existence first or catch IntegrityError per row (slow).
-        # The provided model does not show unique constraints that would make on_conflict_do_nothing always safe.
-        # We will assume it's intended to insert new rows only.
-        # result = await session.execute(stmt.on_conflict_do_nothing()) # Potentially problematic without right constraints
-
-        # Safer generic approach: just insert. If duplicates are an issue, handle at application level or with constraints.
-        await session.execute(stmt) # Removed on_conflict_do_nothing for broader compatibility / if no conflict target
-        # rowcount for bulk insert with 'values' might not be directly available or behave differently across backends
-        # For inserts, rowcount is often -1 with some drivers when not returning.
-        # We'll return the number of items attempted to insert as a proxy.
-        return len(metrics_data)
-
+    return await _bulk_insert(SystemMetric.__table__, _METRIC_COPY_COLUMNS, metrics_data)
 
+async def bulk_insert_logs(logs_data: List[Dict[str, Any]]) -> int:
+    """Write-only ingest of agent log rows (COPY or Core executemany, no ORM objects or RETURNING)."""
+    if not logs_data:
+        return 0
+    return await _bulk_insert(AgentLog.__table__, _LOG_COPY_COLUMNS, logs_data)
+
+class BulkInsertBuffer:
+    """
+    Collects rows and hands them to `writer` (e.g. bulk_insert_logs / bulk_insert_metrics) every
+    `max_rows` rows or `flush_interval` seconds, whichever comes first. `add()` blocks once
+    `max_queued` rows are waiting, so a slow database applies backpressure instead of growing
+    memory without bound.
+    """
+
+    def __init__(self, writer: Callable[[List[Dict[str, Any]]], Awaitable[int]],
+                 max_rows: int = 500, flush_interval: float = 1.0, max_queued: int = 10_000):
+        self.writer = writer
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def add(self, row: Dict[str, Any]) -> None:
+        await self._queue.put(row)
+
+    def add_nowait(self, row: Dict[str, Any]) -> bool:
+        """Queue a row without waiting (e.g. from a sync event handler); False if full and the row was dropped."""
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def stop(self) -> None:
+        """Flush everything queued so far and stop the writer task."""
+        if self._task is None:
+            return
+        await self._queue.put(None) # sentinel: the writer flushes its current batch and exits
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        stopping = False
+        while not stopping:
+            item = await queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.max_rows:
+                try:
+                    # Rows already queued are drained synchronously; wait_for (an extra Task per
+                    # call before 3.12) is only paid when the queue has run dry
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                await self.writer(batch)
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} buffered rows: {e}", exc_info=True)
+
+
+@_ttl_cached()
 async def get_task_queue_size() -> int:
-    async with db_manager.get_session() as session:
+    async with get_db_manager().get_read_session() as session:
         # Count tasks in 'PENDING' or 'RETRY' status, or any status considered active in queue
         stmt = select(func.count(Task.id)).where(Task.status == 'pending') # Use Task.id
         result = await session.execute(stmt)
         return result.scalar_one() or 0
 
+@_ttl_cached()
 async def get_active_agents_count() -> int:
-    async with db_manager.get_session() as session:
+    async with get_db_manager().get_read_session() as session:
         stmt = select(func.count(Agent.id)).where(Agent.status == 'active') # Use Agent.id and 'active'
         result = await session.execute(stmt)
         return result.scalar_one() or 0
@@ -645,9 +1364,9 @@ async def get_active_agents_count() -> int:
 # Initialize database on module import - this should be called at application startup
 async def init_db():
     """Initialize database on startup."""
-    await db_manager.initialize()
+    await get_db_manager().initialize()
 
 # Cleanup function for graceful shutdown - to be called at application shutdown
 async def cleanup_db():
     """Cleanup database connections on shutdown."""
-    await db_manager.close()
+    await get_db_manager().close()
@@ -3,27 +3,161 @@ Database Models - Vision Wagon
 Modelos de base de datos para el sistema Vision Wagon usando SQLAlchemy.
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Float, JSON
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import (
+    Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Float, JSON, Index, text,
+    PrimaryKeyConstraint, DDL, event
+)
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.ext.compiler import compiles
+from dataclasses import asdict, make_dataclass
+from typing import Any
 from datetime import datetime
+import json
 import uuid
 
-Base = declarative_base()
+try:
+    import orjson  # Opcional: serialización en C de los DTO
+except ImportError:
+    orjson = None
+
+def _json_default(value: Any) -> Any:
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)  # datetime / UUID
+
+def _orjson_default(value: Any) -> Any:
+    """orjson sólo serializa uuid.UUID exacto: convierte sus subclases (p. ej. el UUID de asyncpg)"""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+# to_dict(): conversión por tipo exacto (un lookup en dict por campo, sin cadena de if/else); las
+# subclases (p. ej. el UUID que devuelve asyncpg) se reconocen con isinstance cuando el lookup falla
+_DICT_COERCE = {datetime: datetime.isoformat, uuid.UUID: str}
+_DICT_COERCE_BASES = (datetime, uuid.UUID)
+
+class _DTOMixin:
+    """
+    Proyección de las columnas a un dataclass con __slots__ (sin dict intermedio), serializable
+    directamente con orjson. Pensado para rutas calientes (exportación de métricas/logs, respuestas API).
+    """
+
+    @classmethod
+    def dto_class(cls) -> type:
+        dto_cls = cls.__dict__.get('_dto_cls')
+        if dto_cls is None:
+            keys = tuple(column.key for column in cls.__table__.columns)
+            dto_cls = make_dataclass(f'{cls.__name__}DTO', [(key, Any) for key in keys],
+                                     namespace={'__slots__': keys}, frozen=True)
+            cls._dto_cls = dto_cls
+        return dto_cls
+
+    def to_dto(self):
+        dto_cls = self.dto_class()
+        return dto_cls(*(getattr(self, key) for key in dto_cls.__slots__))
+
+    def to_dict(self) -> dict:
+        """Columnas en un dict serializable (datetimes en ISO 8601, UUIDs como str)"""
+        coerce = _DICT_COERCE.get
+        result = {}
+        for key in self.dto_class().__slots__:
+            value = getattr(self, key)
+            convert = coerce(type(value))
+            if convert is not None:
+                value = convert(value)
+            elif isinstance(value, _DICT_COERCE_BASES):
+                value = value.isoformat() if isinstance(value, datetime) else str(value)
+            result[key] = value
+        return result
+
+    def to_json(self) -> bytes:
+        """JSON del DTO; orjson formatea datetimes (UTC) y UUIDs en C"""
+        if orjson is not None:
+            return orjson.dumps(self.to_dto(), default=_orjson_default, option=orjson.OPT_NAIVE_UTC)
+        return json.dumps(asdict(self.to_dto()), default=_json_default).encode('utf-8')
+
+Base = declarative_base(cls=_DTOMixin)
+
+class utcnow(FunctionElement):
+    """Hora UTC (naive) calculada por el servidor: sin datetime de Python ni parámetro por fila"""
+    type = DateTime()
+    inherit_cache = True
+
+@compiles(utcnow, 'postgresql')
+def _pg_utcnow(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+@compiles(utcnow, 'sqlite')
+def _sqlite_utcnow(element, compiler, **kw):
+    # CURRENT_TIMESTAMP sólo tiene resolución de segundos. %f da milisegundos (SS.SSS): el '000' lo
+    # completa al formato con microsegundos con el que SQLAlchemy guarda y compara los DateTime
+    return "STRFTIME('%Y-%m-%d %H:%M:%f000', 'now')"
+
+@compiles(utcnow)
+def _default_utcnow(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+# JSONB en PostgreSQL (binario: sin re-parseo al leer, indexable con GIN); JSON genérico en el resto (SQLite)
+JSONType = JSON().with_variant(JSONB(), 'postgresql')
+
+def _jsonb_gin_index(name: str, column: str) -> Index:
+    """Índice GIN jsonb_path_ops (consultas de contención @>), sólo se crea en PostgreSQL"""
+    return Index(name, column, postgresql_using='gin',
+                 postgresql_ops={column: 'jsonb_path_ops'}).ddl_if(dialect='postgresql')
+
+def _jsonb_key_index(name: str, expression: str) -> Index:
+    """
+    Índice BTREE sobre una subclave extraída (p. ej. "(config->>'provider')"), sólo en PostgreSQL.
+    Cubre =, <, >, BETWEEN y ORDER BY sobre esa misma expresión; NO cubre @> ni ? (eso es del GIN).
+    La consulta debe escribir la expresión idéntica (incluido el cast) para que el planner la use.
+    """
+    return Index(name, text(expression)).ddl_if(dialect='postgresql')
+
+# Series temporales (logs, eventos, métricas): particionadas por rango mensual de timestamp en
+# PostgreSQL. Las consultas por rango sólo recorren las particiones afectadas y los datos viejos
+# se eliminan con DROP de la partición. PostgreSQL exige la clave de partición dentro de la PK.
+_PARTITION_BY_TIMESTAMP = {'postgresql_partition_by': 'RANGE (timestamp)'}
+
+@compiles(PrimaryKeyConstraint)
+def _partitioned_primary_key(element, compiler, **kw):
+    """
+    La PK compuesta (id, timestamp) sólo la necesita el particionado de PostgreSQL; en el resto
+    de dialectos (SQLite) las tablas particionables se crean con PRIMARY KEY (id). El mapper
+    conserva (id, timestamp) como identidad en todos: el timestamp que genera el servidor debe
+    leerse igual que el que SQLAlchemy enlaza (ver _sqlite_utcnow) o selectinload no encuentra filas.
+    """
+    if compiler.dialect.name != 'postgresql' and element.table in PARTITIONED_TABLES:
+        return f'PRIMARY KEY ({compiler.preparer.format_column(element.table.c.id)})'
+    return compiler.visit_primary_key_constraint(element, **kw)
+
+def _default_partition(table) -> None:
+    """Partición DEFAULT (PostgreSQL): recibe las filas de meses que aún no tienen partición propia"""
+    event.listen(table, 'after_create', DDL(
+        'CREATE TABLE IF NOT EXISTS %(table)s_default PARTITION OF %(table)s DEFAULT'
+    ).execute_if(dialect='postgresql'))
 
 class Agent(Base):
     """Modelo para agentes registrados en el sistema"""
     __tablename__ = 'agents'
+    __table_args__ = (
+        # Listados filtran por status y ordenan por created_at DESC
+        Index('ix_agents_status_created', 'status', 'created_at'),
+        # Índice parcial: get_active_agents_count cuenta sólo sobre el subconjunto activo
+        Index('ix_agents_active', 'id',
+              postgresql_where=text("status = 'active'"), sqlite_where=text("status = 'active'")),
+        _jsonb_key_index('ix_agents_config_provider', "(config->>'provider')"),
+    )
 
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Clave de negocio legible (p. ej. 'assembly_agent'); las FKs de logs y tareas apuntan aquí
     agent_id = Column(String(100), unique=True, nullable=False, index=True)
     agent_type = Column(String(50), nullable=False, index=True)
     name = Column(String(200), nullable=False)
     description = Column(Text)
     status = Column(String(20), default='inactive', index=True)  # active, inactive, error
-    config = Column(JSON)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    config = Column(JSONType)
+    created_at = Column(DateTime, server_default=utcnow())
+    updated_at = Column(DateTime, server_default=utcnow(), onupdate=utcnow())
     last_execution = Column(DateTime)
     execution_count = Column(Integer, default=0)
     success_count = Column(Integer, default=0)
@@ -31,112 +165,84 @@ class Agent(Base):
     average_execution_time = Column(Float, default=0.0)
 
     # Relaciones
-    logs = relationship("AgentLog", back_populates="agent", cascade="all, delete-orphan")
-    tasks = relationship("Task", back_populates="agent")
+    # Colecciones grandes: nunca se cargan implícitamente (usar selectinload() en la consulta que las necesite)
+    logs = relationship("AgentLog", back_populates="agent", cascade="all, delete-orphan", lazy="raise")
+    tasks = relationship("Task", back_populates="agent", lazy="raise")
 
     def __repr__(self):
         return f"<Agent(id={self.agent_id}, type={self.agent_type}, status={self.status})>"
 
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'agent_id': self.agent_id,
-            'agent_type': self.agent_type,
-            'name': self.name,
-            'description': self.description,
-            'status': self.status,
-            'config': self.config,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'last_execution': self.last_execution.isoformat() if self.last_execution else None,
-            'execution_count': self.execution_count,
-            'success_count': self.success_count,
-            'error_count': self.error_count,
-            'average_execution_time': self.average_execution_time
-        }
-
 class AgentLog(Base):
     """Modelo para logs de agentes"""
     __tablename__ = 'agent_logs'
-
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    agent_id = Column(String(100), ForeignKey('agents.agent_id'), nullable=False, index=True)
+    __table_args__ = (
+        # Rango por timestamp (listados y cleanup_old_logs); INCLUDE permite index-only scans en PostgreSQL
+        Index('ix_agent_logs_timestamp', 'timestamp', postgresql_include=['agent_id', 'level', 'action']),
+        # Logs de un agente, más recientes primero (también cubre los filtros sólo por agent_id)
+        Index('ix_agent_logs_agent_ts', 'agent_id', 'timestamp'),
+        PrimaryKeyConstraint('id', 'timestamp'),
+        _PARTITION_BY_TIMESTAMP,
+    )
+
+    id = Column(UUID(as_uuid=True), default=uuid.uuid4)
+    agent_id = Column(String(100), ForeignKey('agents.agent_id'), nullable=False)
     execution_id = Column(String(100), index=True)
     action = Column(String(100), nullable=False, index=True)
     level = Column(String(20), default='info', index=True)  # debug, info, warning, error
     message = Column(Text)
-    data = Column(JSON)
-    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    data = Column(JSONType)
+    timestamp = Column(DateTime, server_default=utcnow())
     execution_time = Column(Float)
     success = Column(Boolean)
 
     # Relaciones
-    agent = relationship("Agent", back_populates="logs")
+    agent = relationship("Agent", back_populates="logs", lazy="raise")  # alto volumen: carga explícita
 
     def __repr__(self):
         return f"<AgentLog(agent={self.agent_id}, action={self.action}, level={self.level})>"
 
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'agent_id': self.agent_id,
-            'execution_id': self.execution_id,
-            'action': self.action,
-            'level': self.level,
-            'message': self.message,
-            'data': self.data,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
-            'execution_time': self.execution_time,
-            'success': self.success
-        }
-
 class Campaign(Base):
     """Modelo para campañas de marketing/contenido"""
     __tablename__ = 'campaigns'
+    __table_args__ = (
+        Index('ix_campaigns_status_created', 'status', 'created_at'),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(200), nullable=False)
     description = Column(Text)
     campaign_type = Column(String(50), nullable=False, index=True)  # marketing, content, analysis
     status = Column(String(20), default='draft', index=True)  # draft, active, paused, completed, cancelled
-    config = Column(JSON)
-    target_audience = Column(JSON)
-    metrics = Column(JSON)
+    config = Column(JSONType)
+    target_audience = Column(JSONType)
+    metrics = Column(JSONType)
     budget = Column(Float)
     start_date = Column(DateTime)
     end_date = Column(DateTime)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
+    updated_at = Column(DateTime, server_default=utcnow(), onupdate=utcnow())
     created_by = Column(String(100))
 
     # Relaciones
-    tasks = relationship("Task", back_populates="campaign")
-    contents = relationship("Content", back_populates="campaign")
+    tasks = relationship("Task", back_populates="campaign", lazy="raise")
+    contents = relationship("Content", back_populates="campaign", lazy="raise")
 
     def __repr__(self):
         return f"<Campaign(name={self.name}, type={self.campaign_type}, status={self.status})>"
 
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'name': self.name,
-            'description': self.description,
-            'campaign_type': self.campaign_type,
-            'status': self.status,
-            'config': self.config,
-            'target_audience': self.target_audience,
-            'metrics': self.metrics,
-            'budget': self.budget,
-            'start_date': self.start_date.isoformat() if self.start_date else None,
-            'end_date': self.end_date.isoformat() if self.end_date else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'created_by': self.created_by
-        }
-
 class Task(Base):
     """Modelo para tareas del sistema"""
     __tablename__ = 'tasks'
+    __table_args__ = (
+        # get_tasks: WHERE status = ... ORDER BY priority DESC, created_at DESC
+        Index('ix_tasks_status_prio_created', 'status', 'priority', 'created_at'),
+        # Cola del orquestador: filtro por status, prioridad y programación sin ordenar en memoria
+        Index('ix_tasks_queue', 'status', 'priority', 'scheduled_at'),
+        # Índice parcial sobre la cola pendiente (pops y get_task_queue_size), pequeño aunque la tabla crezca
+        Index('ix_tasks_pending', 'priority', 'scheduled_at',
+              postgresql_where=text("status = 'pending'"), sqlite_where=text("status = 'pending'")),
+        _jsonb_gin_index('ix_tasks_input_gin', 'input_data'),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     task_type = Column(String(50), nullable=False, index=True)
@@ -146,8 +252,8 @@ class Task(Base):
     priority = Column(Integer, default=5, index=True)  # 1-10, 10 = highest
     agent_id = Column(String(100), ForeignKey('agents.agent_id'), index=True)
     campaign_id = Column(UUID(as_uuid=True), ForeignKey('campaigns.id'), index=True)
-    input_data = Column(JSON)
-    output_data = Column(JSON)
+    input_data = Column(JSONType)
+    output_data = Column(JSONType)
     error_message = Column(Text)
     progress = Column(Float, default=0.0)  # 0.0 - 1.0
     estimated_duration = Column(Integer)  # seconds
@@ -155,93 +261,66 @@ class Task(Base):
     scheduled_at = Column(DateTime)
     started_at = Column(DateTime)
     completed_at = Column(DateTime)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
+    updated_at = Column(DateTime, server_default=utcnow(), onupdate=utcnow())
 
     # Relaciones
-    agent = relationship("Agent", back_populates="tasks")
-    campaign = relationship("Campaign", back_populates="tasks")
+    # Many-to-one pequeñas: un único SELECT ... WHERE id IN (...) por lote en vez de N consultas
+    agent = relationship("Agent", back_populates="tasks", lazy="selectin")
+    campaign = relationship("Campaign", back_populates="tasks", lazy="selectin")
 
     def __repr__(self):
         return f"<Task(title={self.title}, status={self.status}, agent={self.agent_id})>"
 
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'task_type': self.task_type,
-            'title': self.title,
-            'description': self.description,
-            'status': self.status,
-            'priority': self.priority,
-            'agent_id': self.agent_id,
-            'campaign_id': str(self.campaign_id) if self.campaign_id else None,
-            'input_data': self.input_data,
-            'output_data': self.output_data,
-            'error_message': self.error_message,
-            'progress': self.progress,
-            'estimated_duration': self.estimated_duration,
-            'actual_duration': self.actual_duration,
-            'scheduled_at': self.scheduled_at.isoformat() if self.scheduled_at else None,
-            'started_at': self.started_at.isoformat() if self.started_at else None,
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
-
 class Content(Base):
     """Modelo para contenido generado"""
     __tablename__ = 'contents'
+    __table_args__ = (
+        Index('ix_contents_status_created', 'status', 'created_at'),
+        _jsonb_gin_index('ix_contents_metadata_gin', 'content_metadata'),
+        _jsonb_key_index('ix_contents_views', "((engagement_metrics->>'views')::int)"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title = Column(String(200), nullable=False)
     content_type = Column(String(50), nullable=False, index=True)  # text, image, video, audio
     format = Column(String(20))  # html, markdown, jpg, mp4, etc.
     content = Column(Text)  # Para texto o URL para multimedia
-    content_metadata = Column(JSON)
-    tags = Column(JSON)
+    content_metadata = Column(JSONType)
+    tags = Column(JSONType)
     is_flagged = Column(Boolean, default=False)
-    moderation_categories = Column(JSON)
+    moderation_categories = Column(JSONType)
     moderated_by = Column(String(100))
     moderated_at = Column(DateTime)
     status = Column(String(20), default='draft', index=True)  # draft, published, archived
     campaign_id = Column(UUID(as_uuid=True), ForeignKey('campaigns.id'), index=True)
     generated_by = Column(String(100)) # agent_id que generó el contenido
     quality_score = Column(Float)  # 0.0 - 1.0
-    engagement_metrics = Column(JSON)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    engagement_metrics = Column(JSONType)
+    created_at = Column(DateTime, server_default=utcnow())
+    updated_at = Column(DateTime, server_default=utcnow(), onupdate=utcnow())
     published_at = Column(DateTime)
 
     # Relaciones
-    campaign = relationship("Campaign", back_populates="contents")
+    campaign = relationship("Campaign", back_populates="contents", lazy="selectin")
 
     def __repr__(self):
         return f"<Content(title={self.title}, type={self.content_type}, status={self.status})>"
 
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'title': self.title,
-            'content_type': self.content_type,
-            'format': self.format,
-            'content': self.content,
-            'metadata': self.metadata,
-            'tags': self.tags,
-            'status': self.status,
-            'campaign_id': str(self.campaign_id) if self.campaign_id else None,
-            'generated_by': self.generated_by,
-            'quality_score': self.quality_score,
-            'engagement_metrics': self.engagement_metrics,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'published_at': self.published_at.isoformat() if self.published_at else None
-        }
-
 class SecurityEvent(Base):
     """Modelo para eventos de seguridad"""
     __tablename__ = 'security_events'
-
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    __table_args__ = (
+        _jsonb_gin_index('ix_security_events_data_gin', 'additional_data'),
+        # Índice parcial: la consulta habitual es sobre eventos abiertos (resolved = false) por
+        # severidad y fecha; los resueltos, la gran mayoría, no entran en el índice
+        Index('ix_security_events_open', 'severity', 'timestamp',
+              postgresql_where=text("resolved = false"), sqlite_where=text("resolved = 0")),
+        PrimaryKeyConstraint('id', 'timestamp'),
+        _PARTITION_BY_TIMESTAMP,
+    )
+
+    id = Column(UUID(as_uuid=True), default=uuid.uuid4)
     event_type = Column(String(50), nullable=False, index=True)  # authentication, authorization, data_access, etc.
     severity = Column(String(20), nullable=False, index=True)  # low, medium, high, critical
     source = Column(String(100), nullable=False)  # agent_id, user_id, system
@@ -250,62 +329,40 @@ class SecurityEvent(Base):
     description = Column(Text)
     ip_address = Column(String(45))
     user_agent = Column(String(500))
-    additional_data = Column(JSON)
+    additional_data = Column(JSONType)
     resolved = Column(Boolean, default=False)
     resolved_at = Column(DateTime)
     resolved_by = Column(String(100))
-    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    timestamp = Column(DateTime, server_default=utcnow(), index=True)
 
     def __repr__(self):
         return f"<SecurityEvent(type={self.event_type}, severity={self.severity}, source={self.source})>"
 
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'event_type': self.event_type,
-            'severity': self.severity,
-            'source': self.source,
-            'target': self.target,
-            'action': self.action,
-            'description': self.description,
-            'ip_address': self.ip_address,
-            'user_agent': self.user_agent,
-            'additional_data': self.additional_data,
-            'resolved': self.resolved,
-            'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None,
-            'resolved_by': self.resolved_by,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None
-        }
-
 class SystemMetric(Base):
     """Modelo para métricas del sistema"""
     __tablename__ = 'system_metrics'
+    __table_args__ = (
+        _jsonb_gin_index('ix_system_metrics_tags_gin', 'tags'),
+        PrimaryKeyConstraint('id', 'timestamp'),
+        _PARTITION_BY_TIMESTAMP,
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), default=uuid.uuid4)
     metric_name = Column(String(100), nullable=False, index=True)
     metric_type = Column(String(50), nullable=False, index=True)  # counter, gauge, histogram
     value = Column(Float, nullable=False)
     unit = Column(String(20))
-    tags = Column(JSON)  # Para filtros y agrupaciones
+    tags = Column(JSONType)  # Para filtros y agrupaciones
     source = Column(String(100))  # agent_id, system component
-    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    timestamp = Column(DateTime, server_default=utcnow(), index=True)
 
     def __repr__(self):
         return f"<SystemMetric(name={self.metric_name}, value={self.value}, source={self.source})>"
 
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'metric_name': self.metric_name,
-            'metric_type': self.metric_type,
-            'value': self.value,
-            'unit': self.unit,
-            'tags': self.tags,
-            'source': self.source,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None
-        }
-
-
+# Tablas particionadas por mes; DatabaseManager.ensure_partitions (database.py) crea las particiones mensuales
+PARTITIONED_TABLES = (AgentLog.__table__, SecurityEvent.__table__, SystemMetric.__table__)
+for _table in PARTITIONED_TABLES:
+    _default_partition(_table)
 
 class AvatarPersonality(Base):
     """Modelo para el perfil de personalidad de un avatar de IA"""
@@ -313,18 +370,8 @@ class AvatarPersonality(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     avatar_id = Column(String(100), unique=True, nullable=False, index=True)
-    personality_profile = Column(JSON)  # JSON con rasgos, tono, etc.
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    personality_profile = Column(JSONType)  # JSON con rasgos, tono, etc.
+    updated_at = Column(DateTime, server_default=utcnow(), onupdate=utcnow())
 
     def __repr__(self):
         return f"<AvatarPersonality(avatar_id={self.avatar_id})>"
-
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'avatar_id': self.avatar_id,
-            'personality_profile': self.personality_profile,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
-
-
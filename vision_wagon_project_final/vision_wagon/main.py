@@ -8,9 +8,14 @@ import logging
 import signal
 import sys
 import os
-from typing import Dict, Any, Optional
+from pathlib import Path
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
+# Directorios de trabajo; logs/ debe existir antes de abrir el FileHandler
+RUNTIME_DIRS = ('logs', 'data', 'temp', 'generated_content')
+Path('logs').mkdir(exist_ok=True)
+
 # Configurar logging
 logging.basicConfig(
     level=logging.INFO,
@@ -26,9 +31,11 @@ logger = logging.getLogger(__name__)
 # Importar componentes principales
 from .config_manager import get_config
 # Updated import for the new DatabaseManager instance and specific functions if needed
-from .database import db_manager, health_check as db_health_check
+from .database import (
+    get_db_manager, health_check as db_health_check, BulkInsertBuffer, bulk_insert_metrics
+)
 from .orchestrator import get_orchestrator
-from .constructor.constructor import get_constructor
+from .constructor.constructor import get_constructor, ContentType
 from .security_validator import get_security_validator
 
 # Importar agentes
@@ -54,22 +61,35 @@ class VisionWagon:
         self.is_running = False
         self.components = {}
         self.agents = {}
-        
-        # Configurar manejadores de señales
-        signal.signal(signal.SIGINT, self._signal_handler)
-        signal.signal(signal.SIGTERM, self._signal_handler)
+        # Métricas: lotes grandes para que cada flush vaya por COPY en PostgreSQL
+        self.metrics_buffer = BulkInsertBuffer(self._flush_metrics_copy, max_rows=10_000, flush_interval=5.0,
+                                               max_queued=50_000)
+        self._shutdown_event = asyncio.Event()
+
+        # Singletons del sistema: se resuelven una sola vez
+        self._config = get_config()
+        self._orchestrator = get_orchestrator()
+        self._orchestrator.on('task_completed', self._record_task_metric)
+        self._constructor = get_constructor()
+        self._security = get_security_validator()
         
         logger.info("Vision Wagon inicializado")
 
-    def _signal_handler(self, signum, frame):
-        """Manejador de señales para cierre graceful"""
-        logger.info(f"Señal recibida: {signum}")
-        asyncio.create_task(self.shutdown())
+    def _install_signal_handlers(self) -> None:
+        """Registra SIGINT/SIGTERM en el event loop para un cierre graceful"""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self._shutdown_event.set)
+            except NotImplementedError:
+                # Windows: sin soporte en el loop, Ctrl+C llega como KeyboardInterrupt
+                pass
 
     async def initialize(self) -> None:
         """Inicializa todos los componentes del sistema"""
         try:
             logger.info("🚀 Iniciando Vision Wagon...")
+            self._install_signal_handlers()
             
             # 1. Cargar configuración
             await self._initialize_config()
@@ -104,20 +124,16 @@ class VisionWagon:
         """Inicializa la configuración del sistema"""
         logger.info("⚙️ Inicializando configuración...")
         
-        config_manager = get_config()
-        
         # Configurar logging según configuración
-        config_manager.setup_logging()
+        self._config.setup_logging()
         
-        logger.info(f"Configuración cargada - Entorno: {config_manager.system.environment}")
+        logger.info(f"Configuración cargada - Entorno: {self._config.system.environment}")
 
     async def _setup_logging(self) -> None:
         """Configura el sistema de logging"""
         # Crear directorio de logs si no existe
         os.makedirs('logs', exist_ok=True)
         
-        config_manager = get_config()
-        
         # El logging ya fue configurado por el config_manager
         logger.info("📝 Sistema de logging configurado")
 
@@ -125,11 +141,12 @@ class VisionWagon:
         """Inicializa la base de datos"""
         logger.info("📊 Inicializando base de datos con DatabaseManager...")
         try:
-            await db_manager.initialize() # Initialize the new DatabaseManager
+            await get_db_manager().initialize() # Initialize the new DatabaseManager
             # Test connection using the new health_check or a similar test
             health = await db_health_check()
             if health.get('status') != 'healthy':
                 raise Exception(f"Fallo en la verificación de salud de la base de datos: {health.get('error', 'Error desconocido')}")
+            self.metrics_buffer.start()
             logger.info("✅ Base de datos inicializada y conexión verificada.")
         except Exception as e:
             logger.error(f"❌ Error inicializando la base de datos: {str(e)}", exc_info=True)
@@ -140,14 +157,12 @@ class VisionWagon:
         logger.info("🔧 Inicializando componentes...")
         
         # Constructor
-        constructor = get_constructor()
-        await constructor.initialize()
-        self.components['constructor'] = constructor
+        await self._constructor.initialize()
+        self.components['constructor'] = self._constructor
         logger.info("✅ Constructor inicializado")
         
         # Security Validator
-        security_validator = get_security_validator()
-        self.components['security'] = security_validator
+        self.components['security'] = self._security
         logger.info("✅ Security Validator inicializado")
         
         logger.info("✅ Componentes principales inicializados")
@@ -156,8 +171,6 @@ class VisionWagon:
         """Registra todos los agentes en el orquestador"""
         logger.info("🤖 Registrando agentes...")
         
-        orchestrator = get_orchestrator()
-        
         # Registrar agentes definidos e importados
         agents_to_register = [
             AssemblyAgent(),
@@ -169,15 +182,19 @@ class VisionWagon:
             # CampaignAgent(),
         ]
 
-        for agent_instance in agents_to_register:
-            try:
-                await orchestrator.register_agent(agent_instance)
-                self.agents[agent_instance.agent_id] = agent_instance
-                logger.info(f"✅ Agente '{agent_instance.agent_id}' registrado exitosamente.")
-            except Exception as e:
-                logger.error(f"❌ Error registrando agente '{agent_instance.agent_id}': {str(e)}")
-                # Decidir si continuar o detener la inicialización si un agente falla
-                # Por ahora, continuaremos registrando otros agentes.
+        # Las inicializaciones de agentes son independientes: registrarlos en paralelo
+        results = await asyncio.gather(
+            *(self._orchestrator.register_agent(agent_instance) for agent_instance in agents_to_register),
+            return_exceptions=True
+        )
+
+        for agent_instance, result in zip(agents_to_register, results):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Error registrando agente '{agent_instance.agent_id}': {str(result)}")
+                # Por ahora, un agente fallido no detiene la inicialización del resto.
+                continue
+            self.agents[agent_instance.agent_id] = agent_instance
+            logger.info(f"✅ Agente '{agent_instance.agent_id}' registrado exitosamente.")
 
         logger.info(f"✅ {len(self.agents)} agentes registrados en total.")
 
@@ -185,9 +202,8 @@ class VisionWagon:
         """Inicia el orquestador"""
         logger.info("🎭 Iniciando orquestador...")
         
-        orchestrator = get_orchestrator()
-        await orchestrator.start()
-        self.components['orchestrator'] = orchestrator
+        await self._orchestrator.start()
+        self.components['orchestrator'] = self._orchestrator
         
         logger.info("✅ Orquestador iniciado")
 
@@ -202,8 +218,7 @@ class VisionWagon:
         logger.info("✅ Verificación de base de datos en _verify_system: OK")
         
         # Verificar orquestador
-        orchestrator = get_orchestrator()
-        system_status = orchestrator.get_system_status()
+        system_status = self._orchestrator.get_system_status()
         if not system_status['is_running']:
             raise Exception("Verificación del orquestador fallida")
         
@@ -223,12 +238,9 @@ class VisionWagon:
         logger.info("Presiona Ctrl+C para detener el sistema")
         
         try:
-            # Bucle principal - mantener el sistema vivo
-            while self.is_running:
-                await asyncio.sleep(1)
-                
-                # Aquí se pueden agregar verificaciones periódicas
-                # Por ejemplo, health checks, métricas, etc.
+            # Esperar a una señal o a shutdown(); sin sondeo periódico del loop
+            await self._shutdown_event.wait()
+            logger.info("Señal de cierre recibida")
                 
         except KeyboardInterrupt:
             logger.info("Interrupción de teclado recibida")
@@ -244,6 +256,7 @@ class VisionWagon:
         
         logger.info("🛑 Cerrando Vision Wagon...")
         self.is_running = False
+        self._shutdown_event.set()
         
         try:
             # Detener orquestador
@@ -264,14 +277,18 @@ class VisionWagon:
                 except Exception as e:
                     logger.error(f"Error limpiando {agent_name}: {str(e)}", exc_info=True)
             
-            # Cerrar conexiones de base de datos
-            await db_manager.close()
+            # Vaciar métricas pendientes y cerrar conexiones de base de datos
+            await self.metrics_buffer.stop()
+            await get_db_manager().close()
             logger.info("✅ Conexiones de base de datos cerradas.")
 
             logger.info("👋 Vision Wagon cerrado exitosamente")
             
         except Exception as e:
             logger.error(f"Error durante el cierre: {str(e)}", exc_info=True)
+        finally:
+            # Vaciar la cola de logs al final, para no perder los mensajes de cierre
+            self._config.stop_logging()
 
     def get_system_info(self) -> Dict[str, Any]:
         """Obtiene información del sistema"""
@@ -295,6 +312,25 @@ class VisionWagon:
         return info
 
     # Métodos de conveniencia para interactuar con el sistema
+
+    async def record_metric(self, metric_data: Dict[str, Any]) -> None:
+        """Encola una métrica del sistema; el flusher periódico la escribe con COPY"""
+        await self.metrics_buffer.add(metric_data)
+
+    def _record_task_metric(self, event: str, data: Dict[str, Any]) -> None:
+        """Manejador síncrono de 'task_completed': encola el tiempo de ejecución sin bloquear al worker"""
+        if not self.metrics_buffer.add_nowait({
+            'metric_name': 'task_execution_time',
+            'metric_type': 'histogram',
+            'value': data['execution_time'],
+            'unit': 'seconds',
+            'source': data['agent_id'],
+        }):
+            logger.debug(f"Buffer de métricas lleno, descartada la de la tarea {data['task_id']}")
+
+    async def _flush_metrics_copy(self, rows: List[Dict[str, Any]]) -> int:
+        """Escribe un lote de métricas: COPY binario con asyncpg, INSERT por lotes en otros drivers"""
+        return await bulk_insert_metrics(rows)
     
     async def submit_task(self, task_type: str, agent_id: str, context: Dict[str, Any]) -> str:
         """Envía una tarea al sistema"""
@@ -316,7 +352,6 @@ class VisionWagon:
         if not constructor:
             raise Exception("Constructor no disponible")
         
-        from constructor.constructor import ContentType
         content_type_enum = ContentType(content_type)
         
         return await constructor.generate_content(content_type_enum, prompt, **kwargs)
@@ -355,10 +390,8 @@ if __name__ == "__main__":
         sys.exit(1)
     
     # Crear directorios necesarios
-    os.makedirs('logs', exist_ok=True)
-    os.makedirs('data', exist_ok=True)
-    os.makedirs('temp', exist_ok=True)
-    os.makedirs('generated_content', exist_ok=True)
+    for path in RUNTIME_DIRS:
+        Path(path).mkdir(parents=True, exist_ok=True)
     
     # Ejecutar sistema
     try:
@@ -4,24 +4,32 @@ Coordinador central que gestiona la ejecución de agentes y flujos de trabajo.
 """
 
 import asyncio
+import dataclasses
+import heapq
+import itertools
 import logging
 import json
+import sys
+import time
 import uuid
-from typing import Dict, Any, Optional, List, Union, Callable
+from typing import Awaitable, Dict, Any, Optional, List, Tuple, Union, Callable
 from datetime import datetime, timedelta
 from dataclasses import dataclass, field
 from enum import Enum
-from collections import defaultdict, deque
-import traceback
+from collections import OrderedDict, defaultdict, deque
 
 from .agents.core.base_agent import BaseAgent, AgentResult
 from .config_manager import get_config
-from .database import db_manager
+from .database import get_db_manager, health_check as db_health_check
 from .database_models import Content
 from .security_validator import get_security_validator
 
 logger = logging.getLogger(__name__)
 
+# Python 3.11+: asyncio.timeout() aplica el límite en la propia corrutina del worker; wait_for
+# (hasta 3.11) envuelve cada ejecución en una Task adicional
+_asyncio_timeout = getattr(asyncio, 'timeout', None)
+
 class TaskStatus(Enum):
     """Estados de las tareas"""
     PENDING = "pending"
@@ -38,7 +46,10 @@ class TaskPriority(Enum):
     HIGH = 3
     CRITICAL = 4
 
-@dataclass
+# Python 3.10+: dataclasses con __slots__ (sin __dict__ por instancia); se crean una por tarea
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_DATACLASS_SLOTS)
 class Task:
     """Representación de una tarea en el sistema"""
     task_id: str
@@ -58,8 +69,106 @@ class Task:
     dependencies: List[str] = field(default_factory=list)
     callback: Optional[Callable] = None
     metadata: Dict[str, Any] = field(default_factory=dict)
+    pending_dependencies: int = 0 # dependencias aún no completadas; se encola al llegar a 0
+    # Reloj monotónico para medir la ejecución (started_at/completed_at quedan para la salida pública)
+    started_ts: Optional[float] = None
+    completed_ts: Optional[float] = None
+    agent_ref: Optional[BaseAgent] = None # agente resuelto en submit_task; None si se desregistró
+    queued: bool = False # True mientras la tarea está en el heap de TaskQueue
+    # isoformat() memoizado de created_at/started_at/completed_at: campo -> (datetime, texto)
+    _iso_cache: Optional[Dict[str, Tuple[datetime, str]]] = field(default=None, repr=False, compare=False)
+
+    def iso(self, name: str) -> Optional[str]:
+        """isoformat() del campo datetime indicado, calculado una vez por valor asignado"""
+        value = getattr(self, name)
+        if value is None:
+            return None
+        if self._iso_cache is None:
+            self._iso_cache = {}
+        cached = self._iso_cache.get(name)
+        if cached is None or cached[0] is not value:
+            cached = self._iso_cache[name] = (value, value.isoformat())
+        return cached[1]
+
+class TaskQueue:
+    """
+    Cola de prioridad de tareas sobre heapq con entradas (-prioridad, secuencia, tarea).
+    La secuencia monotónica desempata en orden FIFO, así nunca se comparan datetimes ni
+    objetos Task. Cada put() despierta a un único worker en espera (sin estampida de todos).
+    Las tareas canceladas quedan como lápidas: se descartan al extraerlas o en bloque (purge)
+    cuando superan el 25% de la cola.
+    """
+
+    def __init__(self):
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._getters: deque = deque() # futures de los workers bloqueados en get(), en orden de llegada
+        self._tombstones = 0 # tareas canceladas que siguen en el heap
+
+    def put(self, task: Task) -> None:
+        task.queued = True
+        heapq.heappush(self._heap, (-task.priority.value, next(self._seq), task))
+        self._wakeup_next()
+
+    def _wakeup_next(self) -> None:
+        while self._getters:
+            waiter = self._getters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
 
-@dataclass
+    def get_nowait(self) -> Task:
+        """Extrae la tarea más prioritaria; IndexError si la cola está vacía"""
+        task = heapq.heappop(self._heap)[2]
+        task.queued = False
+        if self._tombstones and task.status == TaskStatus.CANCELLED:
+            self._tombstones -= 1
+        return task
+
+    def discard(self, task: Task) -> None:
+        """Registra que una tarea encolada se canceló; purga las lápidas si superan el 25% de la cola"""
+        if not task.queued:
+            return # ya salió del heap (o nunca entró): no deja lápida
+        self._tombstones += 1
+        if self._tombstones * 4 > len(self._heap):
+            heap = []
+            for entry in self._heap:
+                if entry[2].status == TaskStatus.CANCELLED:
+                    entry[2].queued = False
+                else:
+                    heap.append(entry)
+            heapq.heapify(heap)
+            self._heap = heap
+            self._tombstones = 0
+
+    async def get(self) -> Task:
+        # Sin await entre la comprobación y el pop: ningún otro worker puede adelantarse
+        while not self._heap:
+            waiter = asyncio.get_running_loop().create_future()
+            self._getters.append(waiter)
+            try:
+                await waiter
+            except BaseException:
+                waiter.cancel()
+                try:
+                    self._getters.remove(waiter)
+                except ValueError:
+                    pass
+                if self._heap and not waiter.cancelled():
+                    self._wakeup_next() # nos despertaron pero nos cancelan: pasar el turno
+                raise
+        return self.get_nowait()
+
+    def peek(self) -> Optional[Task]:
+        return self._heap[0][2] if self._heap else None
+
+    def qsize(self) -> int:
+        return len(self._heap)
+
+    def empty(self) -> bool:
+        return not self._heap
+
+@dataclass(**_DATACLASS_SLOTS)
 class WorkflowStep:
     """Paso en un flujo de trabajo"""
     step_id: str
@@ -71,7 +180,7 @@ class WorkflowStep:
     on_success: Optional[Callable] = None
     on_failure: Optional[Callable] = None
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class Workflow:
     """Flujo de trabajo completo"""
     workflow_id: str
@@ -85,6 +194,44 @@ class Workflow:
     context: Dict[str, Any] = field(default_factory=dict)
     metadata: Dict[str, Any] = field(default_factory=dict)
 
+# Plantillas predefinidas, construidas una vez al importar; _load_workflow_templates registra una copia
+WORKFLOW_TEMPLATES: Dict[str, Workflow] = {
+    # Análisis completo de campaña
+    'campaign_analysis': Workflow(
+        workflow_id='campaign_analysis_template',
+        name="Análisis Completo de Campaña",
+        description="Workflow completo para análisis de rendimiento y seguridad de campañas",
+        steps=[
+            WorkflowStep(
+                step_id='data_collection',
+                agent_id='intelligence_agent',
+                task_type='collect_campaign_data',
+                context={'analysis_type': 'campaign_performance'}
+            ),
+            WorkflowStep(
+                step_id='security_check',
+                agent_id='security_agent',
+                task_type='security_audit',
+                context={'audit_type': 'campaign_security'}
+            ),
+            WorkflowStep(
+                step_id='performance_analysis',
+                agent_id='intelligence_agent',
+                task_type='analyze_performance',
+                context={'include_visualizations': True},
+                dependencies=['data_collection']
+            ),
+            WorkflowStep(
+                step_id='generate_report',
+                agent_id='intelligence_agent',
+                task_type='generate_report',
+                context={'report_type': 'comprehensive'},
+                dependencies=['performance_analysis', 'security_check']
+            ),
+        ]
+    ),
+}
+
 class Orchestrator:
     """
     Orquestador central del sistema Vision Wagon.
@@ -118,15 +265,29 @@ class Orchestrator:
         self.agent_capabilities: Dict[str, List[str]] = {}
         
         # Gestión de tareas
-        self.task_queue = asyncio.PriorityQueue() # Stores (priority, time, task_obj)
+        self.task_queue = TaskQueue() # Mayor prioridad primero; FIFO dentro de la misma prioridad
         self.pending_tasks_by_id: Dict[str, Task] = {} # For quick lookup of tasks in queue
+        # Tareas en espera indexadas por la dependencia que les falta; se encolan una sola vez,
+        # cuando se completa la última (sin re-encolar ni sondear)
+        self._dependency_waiters: Dict[str, List[Task]] = defaultdict(list)
         self.running_tasks: Dict[str, Task] = {}
-        self.completed_tasks: Dict[str, Task] = {} # Includes successfully completed tasks
-        self.failed_tasks: Dict[str, Task] = {} # Includes failed and cancelled tasks
+        # Histórico acotado (más antiguas primero); al superar el límite, las tareas se
+        # reducen a (estado, agente) en _task_history_summary
+        self._max_retained = orchestrator_config.max_retained_tasks or 10_000
+        self.completed_tasks: Dict[str, Task] = OrderedDict() # Includes successfully completed tasks
+        self.failed_tasks: Dict[str, Task] = OrderedDict() # Includes failed and cancelled tasks
+        self._task_history_summary: Dict[str, Tuple[str, str]] = {}
+        # Contadores por agente para la tasa de error (O(1) en vez de recorrer el histórico)
+        self._per_agent_completed: Dict[str, int] = defaultdict(int)
+        self._per_agent_failed: Dict[str, int] = defaultdict(int)
+        self._per_agent_running: Dict[str, int] = defaultdict(int)
+        self._tick_now: Optional[datetime] = None # ver _now()
         
         # Gestión de workflows
         self.workflows: Dict[str, Workflow] = {}
         self.workflow_templates: Dict[str, Workflow] = {}
+        # Plan resuelto por workflow: (step_id, agent_id, task_type, contexto base, step_ids de dependencias)
+        self._workflow_plan_cache: Dict[str, List[Tuple[str, str, str, Dict[str, Any], Tuple[str, ...]]]] = {}
         
         # Métricas y monitoreo
         self.metrics = {
@@ -142,9 +303,12 @@ class Orchestrator:
         self.is_running = False
         self.worker_tasks = []
         self.health_check_task = None
+        # agent_id -> time.monotonic() del último health check exitoso; se omiten durante 3 intervalos
+        self._agent_health_cache: Dict[str, float] = {}
         
         # Eventos y callbacks
-        self.event_handlers: Dict[str, List[Callable]] = defaultdict(list)
+        # evento -> (manejadores async, manejadores sync), clasificados una vez en on()
+        self.event_handlers: Dict[str, Tuple[List[Callable], List[Callable]]] = {}
         
         logger.info("Orchestrator inicializado")
 
@@ -159,16 +323,24 @@ class Orchestrator:
             
             # Asegurarse que db_manager esté inicializado (normalmente se hace en main.py)
             # pero por si acaso el orquestador se inicia independientemente o antes.
+            db_manager = get_db_manager()
             if not db_manager._initialized:
                 logger.warning("Orchestrator: DatabaseManager no inicializado, intentando inicializar...")
                 await db_manager.initialize()
 
-            # Verificar conexión a la BD usando la función de health_check del nuevo database.py
-            db_health = await db_manager.health_check() # Asumiendo que db_manager tiene health_check
+            # Verificar conexión a la BD usando la función de health_check de database.py
+            db_health = await db_health_check()
             if db_health.get('status') != 'healthy':
                 raise Exception(f"Orchestrator: Fallo en la verificación de salud de la base de datos al iniciar: {db_health.get('error', 'Error desconocido')}")
             logger.info("Orchestrator: Conexión a base de datos verificada.")
 
+            # Python 3.12+: las tareas se ejecutan en línea hasta su primera suspensión real; los
+            # manejadores rápidos (eventos, callbacks) terminan sin pasar por el event loop
+            eager_task_factory = getattr(asyncio, 'eager_task_factory', None)
+            loop = asyncio.get_running_loop()
+            if eager_task_factory is not None and loop.get_task_factory() is None:
+                loop.set_task_factory(eager_task_factory)
+
             # Iniciar workers para procesamiento de tareas
             for i in range(self.max_concurrent_tasks):
                 worker = asyncio.create_task(self._task_worker(f"worker_{i}"))
@@ -268,6 +440,11 @@ class Orchestrator:
             
             del self.registered_agents[agent_id]
             del self.agent_capabilities[agent_id]
+            self._agent_health_cache.pop(agent_id, None)
+            # Las tareas pendientes de este agente ya no deben ejecutarse sobre él
+            for pending in self.pending_tasks_by_id.values():
+                if pending.agent_id == agent_id:
+                    pending.agent_ref = None
             
             logger.info(f"Agente desregistrado: {agent_id}")
             
@@ -312,33 +489,42 @@ class Orchestrator:
             max_retries=max_retries or 3,
             dependencies=dependencies or [],
             callback=callback,
-            metadata=metadata or {}
+            metadata=metadata or {},
+            agent_ref=self.registered_agents[agent_id],
+            created_at=self._now()
         )
         
         # Validar dependencias
         await self._validate_task_dependencies(task)
         
-        # Agregar a cola con prioridad
-        priority_value = priority.value
-        await self.task_queue.put((priority_value, task.created_at, task))
+        # Agregar a cola con prioridad, o dejarla en espera de sus dependencias
         self.pending_tasks_by_id[task.task_id] = task # Add to lookup dict
+        unmet = {dep_id for dep_id in task.dependencies if not self._is_completed(dep_id)}
+        if unmet:
+            task.pending_dependencies = len(unmet)
+            for dep_id in unmet:
+                self._dependency_waiters[dep_id].append(task)
+        else:
+            self.task_queue.put(task)
         
         logger.info(f"Tarea enviada: {task.task_id} ({task_type}) -> {agent_id}")
         
         # Emitir evento
-        await self._emit_event('task_submitted', {
+        pending = self._emit_event_sync('task_submitted', {
             'task_id': task.task_id,
             'task_type': task_type,
             'agent_id': agent_id,
             'priority': priority.name
         })
+        if pending is not None:
+            await pending
         
         return task.task_id
 
     async def _validate_task_dependencies(self, task: Task) -> None:
         """Valida las dependencias de una tarea"""
         for dep_id in task.dependencies:
-            if dep_id not in self.completed_tasks:
+            if not self._is_completed(dep_id):
                 # Verificar si la dependencia está en ejecución o pendiente
                 if dep_id not in self.running_tasks and dep_id not in self.pending_tasks_by_id:
                     raise ValueError(f"Dependencia no encontrada o no en estado válido: {dep_id}")
@@ -349,36 +535,12 @@ class Orchestrator:
         
         while self.is_running:
             try:
-                # Obtener tarea de la cola con timeout
-                try:
-                    priority, created_at, task = await asyncio.wait_for(
-                        self.task_queue.get(), timeout=1.0
-                    )
-                except asyncio.TimeoutError:
-                    continue # Continue to next iteration of while loop to check self.is_running
-
-                # Task dequeued, remove from pending_tasks_by_id
-                if task.task_id in self.pending_tasks_by_id:
-                    del self.pending_tasks_by_id[task.task_id]
-                
-                # Verificar dependencias y estado de la tarea antes de procesar
-                if task.status == TaskStatus.CANCELLED:
-                    logger.info(f"Worker {worker_id}: Tarea {task.task_id} ya estaba cancelada, descartando.")
-                    # Asegurarse de que esté en failed_tasks si se canceló mientras estaba en la cola
-                    if task.task_id not in self.failed_tasks:
-                         self.failed_tasks[task.task_id] = task
-                    continue
-
-                if not await self._check_task_dependencies(task):
-                    # Re-enqueue if dependencies are not met
-                    logger.debug(f"Dependencias no listas para tarea {task.task_id}, re-encolando.")
-                    await self.task_queue.put((priority, created_at, task))
-                    self.pending_tasks_by_id[task.task_id] = task # Add back to lookup
-                    await asyncio.sleep(1) # Avoid busy-looping
-                    continue
-                
-                # Ejecutar tarea
-                await self._process_single_task(task, worker_id)
+                # Bloquea hasta que haya una tarea; stop() cancela el worker, así que no hace
+                # falta despertar periódicamente para revisar self.is_running.
+                # Una tarea por get(): put() despierta a un único worker (TaskQueue), y un lote
+                # local dejaría tareas rápidas esperando detrás de una lenta con otros workers libres
+                task = await self.task_queue.get()
+                await self._dispatch_task(task, worker_id)
                 
             except asyncio.CancelledError:
                 logger.info(f"Worker {worker_id} cancelado.")
@@ -389,12 +551,88 @@ class Orchestrator:
         
         logger.info(f"Worker {worker_id} detenido")
 
-    async def _check_task_dependencies(self, task: Task) -> bool:
-        """Verifica si las dependencias de una tarea están completadas"""
-        for dep_id in task.dependencies:
-            if dep_id not in self.completed_tasks:
-                return False
-        return True
+    async def _dispatch_task(self, task: Task, worker_id: str) -> None:
+        """Ejecuta una tarea extraída de la cola"""
+        # Task dequeued, remove from pending_tasks_by_id
+        self.pending_tasks_by_id.pop(task.task_id, None)
+        
+        # Verificar el estado de la tarea antes de procesar
+        if task.status == TaskStatus.CANCELLED:
+            logger.info(f"Worker {worker_id}: Tarea {task.task_id} ya estaba cancelada, descartando.")
+            # Asegurarse de que esté en failed_tasks si se canceló mientras estaba en la cola
+            if task.task_id not in self.failed_tasks and task.task_id not in self._task_history_summary:
+                 self._retain_failed(task)
+            return
+        
+        # Ejecutar tarea (sólo se encolan tareas con sus dependencias ya completadas)
+        await self._process_single_task(task, worker_id)
+
+    def _now(self) -> datetime:
+        """
+        datetime.utcnow() compartido por todas las transiciones de una misma iteración del event
+        loop (cancelaciones o fallos en cascada, lotes de tareas): se recalcula en la siguiente
+        """
+        now = self._tick_now
+        if now is None:
+            now = self._tick_now = datetime.utcnow()
+            asyncio.get_running_loop().call_soon(self._clear_tick_now)
+        return now
+
+    def _clear_tick_now(self) -> None:
+        self._tick_now = None
+
+    def _remove_running(self, task_id: str) -> None:
+        """Saca la tarea de running_tasks (si sigue ahí) y actualiza el contador de su agente"""
+        task = self.running_tasks.pop(task_id, None)
+        if task is not None:
+            self._per_agent_running[task.agent_id] -= 1
+
+    def _is_completed(self, task_id: str) -> bool:
+        """Indica si la tarea terminó con éxito, aunque ya se haya reducido a su resumen"""
+        if task_id in self.completed_tasks:
+            return True
+        summary = self._task_history_summary.get(task_id)
+        return summary is not None and summary[0] == TaskStatus.COMPLETED.value
+
+    def _retain_completed(self, task: Task) -> None:
+        """Registra una tarea completada respetando el límite del histórico"""
+        self.completed_tasks[task.task_id] = task
+        self._per_agent_completed[task.agent_id] += 1
+        self._trim_history(self.completed_tasks)
+
+    def _retain_failed(self, task: Task) -> None:
+        """Registra una tarea fallida o cancelada respetando el límite del histórico"""
+        self.failed_tasks[task.task_id] = task
+        self._per_agent_failed[task.agent_id] += 1
+        self._trim_history(self.failed_tasks)
+
+    def _trim_history(self, tasks: Dict[str, Task]) -> None:
+        """Reduce las tareas más antiguas a (estado, agente) al superar _max_retained"""
+        while len(tasks) > self._max_retained:
+            task_id, task = tasks.popitem(last=False)
+            self._task_history_summary[task_id] = (task.status.value, task.agent_id)
+
+    def _release_dependents(self, task_id: str) -> None:
+        """Encola las tareas cuya última dependencia pendiente era task_id"""
+        for waiter in self._dependency_waiters.pop(task_id, ()):
+            waiter.pending_dependencies -= 1
+            if waiter.pending_dependencies == 0 and waiter.status == TaskStatus.PENDING:
+                self.task_queue.put(waiter)
+
+    async def _fail_dependents(self, task_id: str) -> None:
+        """Marca como fallidas (en cascada) las tareas en espera de una dependencia que nunca se completará"""
+        for waiter in self._dependency_waiters.pop(task_id, ()):
+            if waiter.status != TaskStatus.PENDING:
+                continue
+            waiter.status = TaskStatus.FAILED
+            waiter.error = f"Dependencia {task_id} no completada"
+            waiter.completed_at = self._now()
+            self.pending_tasks_by_id.pop(waiter.task_id, None)
+            self._retain_failed(waiter)
+            pending = self._emit_event_sync('task_failed', {'task_id': waiter.task_id, 'error': waiter.error, 'retry_count': waiter.retry_count})
+            if pending is not None:
+                await pending
+            await self._fail_dependents(waiter.task_id)
 
     async def _process_single_task(self, task: Task, worker_id: str) -> None:
         """
@@ -402,22 +640,35 @@ class Orchestrator:
         y actualiza su estado y las métricas.
         """
         task.status = TaskStatus.RUNNING
-        task.started_at = datetime.utcnow()
+        task.started_at = self._now()
+        task.started_ts = time.monotonic()
         self.running_tasks[task.task_id] = task
+        self._per_agent_running[task.agent_id] += 1
         
         logger.info(f"Worker {worker_id}: Iniciando tarea {task.task_id} ({task.task_type}) por agente {task.agent_id}")
         
         try:
-            await self._emit_event('task_started', {'task_id': task.task_id, 'worker_id': worker_id, 'agent_id': task.agent_id})
+            pending = self._emit_event_sync('task_started', {'task_id': task.task_id, 'worker_id': worker_id, 'agent_id': task.agent_id})
+            if pending is not None:
+                await pending
             
-            agent = self.registered_agents[task.agent_id]
-            result = await asyncio.wait_for(
-                agent.process(task.context),
-                timeout=task.timeout
-            )
+            agent = task.agent_ref
+            if agent is None: # desregistrado tras el submit; puede haberse vuelto a registrar
+                agent = task.agent_ref = self.registered_agents.get(task.agent_id)
+                if agent is None:
+                    raise ValueError(f"Agente no registrado: {task.agent_id}")
+            if _asyncio_timeout is not None:
+                async with _asyncio_timeout(task.timeout):
+                    result = await agent.process(task.context)
+            else:
+                result = await asyncio.wait_for(
+                    agent.process(task.context),
+                    timeout=task.timeout
+                )
             
             task.result = result
-            task.completed_at = datetime.utcnow()
+            task.completed_at = self._now()
+            task.completed_ts = time.monotonic()
             
             if result.success:
                 await self._handle_task_success(task)
@@ -431,18 +682,19 @@ class Orchestrator:
             await self._handle_task_failure(task, worker_id)
         except Exception as e:
             task.error = f"Excepción ejecutando tarea {task.task_id}: {str(e)}"
-            logger.error(task.error, exc_info=True)
+            # Traceback completo sólo en DEBUG: con agentes inestables formatearlo en cada fallo es caro
+            logger.error(task.error, exc_info=logger.isEnabledFor(logging.DEBUG))
             await self._handle_task_failure(task, worker_id)
         
         finally:
-            if task.task_id in self.running_tasks:
-                del self.running_tasks[task.task_id]
+            self._remove_running(task.task_id)
             await self._update_task_metrics(task)
 
     async def _handle_task_success(self, task: Task) -> None:
         """Maneja la finalización exitosa de una tarea."""
         task.status = TaskStatus.COMPLETED
-        self.completed_tasks[task.task_id] = task
+        self._retain_completed(task)
+        self._release_dependents(task.task_id)
 
         logger.info(f"Tarea {task.task_id} completada exitosamente.")
 
@@ -450,13 +702,16 @@ class Orchestrator:
             try:
                 await task.callback(task, task.result)
             except Exception as e:
-                logger.error(f"Error en callback de tarea {task.task_id}: {str(e)}", exc_info=True)
+                logger.error(f"Error en callback de tarea {task.task_id}: {str(e)}", exc_info=logger.isEnabledFor(logging.DEBUG))
 
-        await self._emit_event('task_completed', {
+        pending = self._emit_event_sync('task_completed', {
             'task_id': task.task_id,
-            'execution_time': (task.completed_at - task.started_at).total_seconds() if task.completed_at and task.started_at else 0,
+            'agent_id': task.agent_id,
+            'execution_time': self._execution_time(task) or 0,
             'result': task.result.data if task.result and hasattr(task.result, 'data') else None
         })
+        if pending is not None:
+            await pending
 
     async def _handle_task_failure(self, task: Task, worker_id: str) -> None:
         """Maneja el fallo de una tarea, incluyendo lógica de reintentos."""
@@ -466,21 +721,34 @@ class Orchestrator:
             logger.warning(f"Worker {worker_id}: Fallo en tarea {task.task_id} (intento {task.retry_count}/{task.max_retries}). Error: {task.error}. Reintentando...")
             task.status = TaskStatus.PENDING
             task.started_at = None # Reset start time for retry
+            task.started_ts = task.completed_ts = None
+            # El agente pudo desregistrarse mientras la tarea corría (unregister_agent sólo limpia
+            # las pendientes): el reintento vuelve a resolverlo en registered_agents
+            task.agent_ref = None
             
             await asyncio.sleep(self.retry_delay)
             
-            priority_value = task.priority.value
-            await self.task_queue.put((priority_value, task.created_at, task)) # Re-enqueue
+            self.task_queue.put(task) # Re-enqueue
             self.pending_tasks_by_id[task.task_id] = task # Add back to lookup
             
             await self._emit_event('task_retry', {'task_id': task.task_id, 'retry_count': task.retry_count, 'error': task.error})
         else:
             logger.error(f"Worker {worker_id}: Tarea {task.task_id} falló definitivamente después de {task.retry_count} intentos. Error: {task.error}")
             task.status = TaskStatus.FAILED
-            task.completed_at = datetime.utcnow() # Mark completion time for failed task
-            self.failed_tasks[task.task_id] = task
+            task.completed_at = self._now() # Mark completion time for failed task
+            self._retain_failed(task)
             
-            await self._emit_event('task_failed', {'task_id': task.task_id, 'error': task.error, 'retry_count': task.retry_count})
+            pending = self._emit_event_sync('task_failed', {'task_id': task.task_id, 'error': task.error, 'retry_count': task.retry_count})
+            if pending is not None:
+                await pending
+            await self._fail_dependents(task.task_id)
+
+    @staticmethod
+    def _execution_time(task: Task) -> Optional[float]:
+        """Segundos de ejecución según el reloj monotónico, o None si la tarea no llegó a completarse"""
+        if task.started_ts is None or task.completed_ts is None:
+            return None
+        return task.completed_ts - task.started_ts
 
     async def _update_task_metrics(self, task: Task) -> None:
         """Actualiza las métricas relacionadas con la ejecución de una tarea."""
@@ -490,8 +758,8 @@ class Orchestrator:
             self.metrics['tasks_completed'] += 1
             
             # Tiempo de ejecución
-            if task.started_at and task.completed_at:
-                execution_time = (task.completed_at - task.started_at).total_seconds()
+            execution_time = self._execution_time(task)
+            if execution_time is not None:
                 current_avg = self.metrics['average_execution_time']
                 total_completed = self.metrics['tasks_completed']
                 
@@ -505,9 +773,8 @@ class Orchestrator:
             
             # Tasa de error por agente
             agent_id = task.agent_id
-            total_agent_tasks = sum(1 for t in list(self.completed_tasks.values()) + list(self.failed_tasks.values()) 
-                                  if t.agent_id == agent_id)
-            failed_agent_tasks = sum(1 for t in self.failed_tasks.values() if t.agent_id == agent_id)
+            failed_agent_tasks = self._per_agent_failed[agent_id]
+            total_agent_tasks = failed_agent_tasks + self._per_agent_completed[agent_id]
             
             if total_agent_tasks > 0:
                 self.metrics['error_rates'][agent_id] = failed_agent_tasks / total_agent_tasks
@@ -537,22 +804,37 @@ class Orchestrator:
                 result = await asyncio.wait_for(agent.process(health_context), timeout=5.0)
                 if not result.success:
                     logger.warning(f"Agente {agent_id} reportó health check no exitoso: {result.error}")
+                    self._agent_health_cache.pop(agent_id, None)
                     return agent_id
             except asyncio.TimeoutError:
                 logger.warning(f"Agente {agent_id} timed out durante health check.")
+                self._agent_health_cache.pop(agent_id, None)
                 return agent_id
             except Exception as e:
                 logger.warning(f"Excepción durante health check del agente {agent_id}: {str(e)}")
+                self._agent_health_cache.pop(agent_id, None)
                 return agent_id
+            self._agent_health_cache[agent_id] = time.monotonic()
             return None
 
-        # Verificar agentes en paralelo
-        agent_checks = [check_agent_health(agent_id, agent) for agent_id, agent in self.registered_agents.items()]
-        results = await asyncio.gather(*agent_checks)
+        # Verificar en paralelo sólo los agentes sin un health check exitoso reciente
+        now = time.monotonic()
+        healthy_ttl = self.health_check_interval * 3
+        due = [
+            (agent_id, agent) for agent_id, agent in self.registered_agents.items()
+            if now - self._agent_health_cache.get(agent_id, float('-inf')) >= healthy_ttl
+        ]
+        if hasattr(asyncio, 'TaskGroup'):
+            # Python 3.11+: si stop() cancela el health check, se cancelan también las sondas en curso
+            async with asyncio.TaskGroup() as tg:
+                probes = [tg.create_task(check_agent_health(agent_id, agent)) for agent_id, agent in due]
+            results = [probe.result() for probe in probes]
+        else:
+            results = await asyncio.gather(*(check_agent_health(agent_id, agent) for agent_id, agent in due))
         unhealthy_agents = [agent_id for agent_id in results if agent_id is not None]
 
-        # Verificar base de datos
-        db_health_status = await db_manager.health_check() # Usar la nueva función de health_check
+        # Verificar base de datos (resultado cacheado unos segundos en database.health_check)
+        db_health_status = await db_health_check()
         db_healthy = db_health_status.get('status') == 'healthy'
         
         # Verificar cola de tareas
@@ -628,7 +910,7 @@ class Orchestrator:
         workflow.started_at = datetime.utcnow()
         workflow.context = context or {}
         
-        execution_id = f"{workflow_id}_{int(datetime.utcnow().timestamp())}"
+        execution_id = f"{workflow_id}_{time.time_ns()}"
         
         logger.info(f"Ejecutando workflow: {workflow.name} (ID: {execution_id})")
         
@@ -636,20 +918,17 @@ class Orchestrator:
             # Crear tareas para cada paso
             step_tasks = {}
             
-            for step in workflow.steps:
-                # Combinar contexto del workflow con contexto del paso
-                step_context = {**workflow.context, **step.context}
-                
-                # Crear tarea
+            for step_id, agent_id, task_type, step_context, dep_step_ids in self._workflow_plan(workflow):
+                # Crear tarea (contexto del workflow combinado con el del paso)
                 task_id = await self.submit_task(
-                    task_type=step.task_type,
-                    agent_id=step.agent_id,
-                    context=step_context,
-                    dependencies=[step_tasks[dep] for dep in step.dependencies if dep in step_tasks],
-                    metadata={'workflow_id': workflow_id, 'execution_id': execution_id, 'step_id': step.step_id}
+                    task_type=task_type,
+                    agent_id=agent_id,
+                    context={**workflow.context, **step_context},
+                    dependencies=[step_tasks[dep] for dep in dep_step_ids],
+                    metadata={'workflow_id': workflow_id, 'execution_id': execution_id, 'step_id': step_id}
                 )
                 
-                step_tasks[step.step_id] = task_id
+                step_tasks[step_id] = task_id
             
             # Emitir evento
             await self._emit_event('workflow_started', {
@@ -665,45 +944,38 @@ class Orchestrator:
             logger.error(f"Error ejecutando workflow {workflow_id}: {str(e)}")
             raise
 
+    def _workflow_plan(self, workflow: Workflow) -> List[Tuple[str, str, str, Dict[str, Any], Tuple[str, ...]]]:
+        """
+        Pasos del workflow resueltos una vez y cacheados por workflow_id (las definiciones no se
+        modifican tras create_workflow). Sólo se conservan dependencias de pasos anteriores.
+        """
+        plan = self._workflow_plan_cache.get(workflow.workflow_id)
+        if plan is None:
+            seen = set()
+            plan = []
+            for step in workflow.steps:
+                deps = tuple(dep for dep in step.dependencies if dep in seen)
+                plan.append((step.step_id, step.agent_id, step.task_type, step.context, deps))
+                seen.add(step.step_id)
+            self._workflow_plan_cache[workflow.workflow_id] = plan
+        return plan
+
     async def _load_workflow_templates(self) -> None:
-        """Carga plantillas de workflows predefinidos"""
-        # Workflow de ejemplo: Análisis completo de campaña
-        campaign_analysis_steps = [
-            {
-                'step_id': 'data_collection',
-                'agent_id': 'intelligence_agent',
-                'task_type': 'collect_campaign_data',
-                'context': {'analysis_type': 'campaign_performance'},
-                'dependencies': []
-            },
-            {
-                'step_id': 'security_check',
-                'agent_id': 'security_agent',
-                'task_type': 'security_audit',
-                'context': {'audit_type': 'campaign_security'},
-                'dependencies': []
-            },
-            {
-                'step_id': 'performance_analysis',
-                'agent_id': 'intelligence_agent',
-                'task_type': 'analyze_performance',
-                'context': {'include_visualizations': True},
-                'dependencies': ['data_collection']
-            },
-            {
-                'step_id': 'generate_report',
-                'agent_id': 'intelligence_agent',
-                'task_type': 'generate_report',
-                'context': {'report_type': 'comprehensive'},
-                'dependencies': ['performance_analysis', 'security_check']
-            }
-        ]
-        
-        await self.create_workflow(
-            name="Análisis Completo de Campaña",
-            description="Workflow completo para análisis de rendimiento y seguridad de campañas",
-            steps=campaign_analysis_steps
-        )
+        """Registra las plantillas de workflows predefinidos (una sola vez, aunque se reinicie)"""
+        for template_key, template in WORKFLOW_TEMPLATES.items():
+            if template_key in self.workflow_templates:
+                continue
+            workflow = dataclasses.replace(
+                template,
+                workflow_id=str(uuid.uuid4()),
+                steps=list(template.steps),
+                created_at=datetime.utcnow(),
+                context={},
+                metadata={}
+            )
+            self.workflows[workflow.workflow_id] = workflow
+            self.workflow_templates[template_key] = workflow
+            logger.info(f"Workflow creado: {workflow.workflow_id} ({workflow.name})")
         
         logger.info("Plantillas de workflow cargadas")
 
@@ -717,7 +989,11 @@ class Orchestrator:
             event: Nombre del evento
             handler: Función manejadora
         """
-        self.event_handlers[event].append(handler)
+        async_handlers, sync_handlers = self.event_handlers.setdefault(event, ([], []))
+        if asyncio.iscoroutinefunction(handler):
+            async_handlers.append(handler)
+        else:
+            sync_handlers.append(handler)
 
     async def _emit_event(self, event: str, data: Dict[str, Any]) -> None:
         """
@@ -727,15 +1003,35 @@ class Orchestrator:
             event: Nombre del evento
             data: Datos del evento
         """
-        if event in self.event_handlers:
-            for handler in self.event_handlers[event]:
-                try:
-                    if asyncio.iscoroutinefunction(handler):
-                        await handler(event, data)
-                    else:
-                        handler(event, data)
-                except Exception as e:
-                    logger.error(f"Error en manejador de evento {event}: {str(e)}")
+        pending = self._emit_event_sync(event, data)
+        if pending is not None:
+            await pending
+
+    def _emit_event_sync(self, event: str, data: Dict[str, Any]) -> Optional[Awaitable[None]]:
+        """
+        Ejecuta en línea los manejadores síncronos del evento. Si hay manejadores async devuelve
+        la corrutina que los ejecuta (el llamador la espera); si no, None y no hay ningún await.
+        """
+        entry = self.event_handlers.get(event)
+        if not entry:
+            return None # caso habitual: nadie escucha este evento
+        async_handlers, sync_handlers = entry
+        for handler in sync_handlers:
+            try:
+                handler(event, data)
+            except Exception as e:
+                logger.error(f"Error en manejador de evento {event}: {str(e)}")
+        if async_handlers:
+            return self._emit_event_async(event, async_handlers, data)
+        return None
+
+    async def _emit_event_async(self, event: str, async_handlers: List[Callable], data: Dict[str, Any]) -> None:
+        """Ejecuta concurrentemente los manejadores async del evento"""
+        results = await asyncio.gather(*(handler(event, data) for handler in async_handlers),
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Error en manejador de evento {event}: {str(result)}")
 
     # Métodos de consulta y estado
     
@@ -756,6 +1052,11 @@ class Orchestrator:
             task = self.failed_tasks[task_id]
             return self._task_to_dict(task)
         
+        # Tareas antiguas ya retiradas del histórico
+        if task_id in self._task_history_summary:
+            status, agent_id = self._task_history_summary[task_id]
+            return {'task_id': task_id, 'agent_id': agent_id, 'status': status}
+        
         return None
 
     def _task_to_dict(self, task: Task) -> Dict[str, Any]:
@@ -766,15 +1067,20 @@ class Orchestrator:
             'agent_id': task.agent_id,
             'status': task.status.value,
             'priority': task.priority.name,
-            'created_at': task.created_at.isoformat(),
-            'started_at': task.started_at.isoformat() if task.started_at else None,
-            'completed_at': task.completed_at.isoformat() if task.completed_at else None,
+            'created_at': task.iso('created_at'),
+            'started_at': task.iso('started_at'),
+            'completed_at': task.iso('completed_at'),
             'retry_count': task.retry_count,
             'error': task.error,
-            'result': task.result.__dict__ if task.result else None,
+            'result': self._result_to_dict(task.result) if task.result else None,
             'metadata': task.metadata
         }
 
+    @staticmethod
+    def _result_to_dict(result: AgentResult) -> Dict[str, Any]:
+        """Copia plana del resultado: no expone el __dict__ vivo del objeto y funciona con __slots__"""
+        return {'success': result.success, 'data': result.data, 'error': result.error}
+
     def get_system_status(self) -> Dict[str, Any]:
         """Obtiene el estado general del sistema"""
         return {
@@ -797,9 +1103,9 @@ class Orchestrator:
         agent = self.registered_agents[agent_id]
         
         # Contar tareas por estado para este agente
-        agent_running = sum(1 for t in self.running_tasks.values() if t.agent_id == agent_id)
-        agent_completed = sum(1 for t in self.completed_tasks.values() if t.agent_id == agent_id)
-        agent_failed = sum(1 for t in self.failed_tasks.values() if t.agent_id == agent_id)
+        agent_running = self._per_agent_running.get(agent_id, 0)
+        agent_completed = self._per_agent_completed.get(agent_id, 0)
+        agent_failed = self._per_agent_failed.get(agent_id, 0)
         
         return {
             'agent_id': agent_id,
@@ -827,35 +1133,34 @@ class Orchestrator:
         if task_id in self.running_tasks:
             task_to_cancel = self.running_tasks[task_id]
             task_to_cancel.status = TaskStatus.CANCELLED
-            task_to_cancel.completed_at = datetime.utcnow()
+            task_to_cancel.completed_at = self._now()
             # Consider how to signal the running task to stop, if it's long-running.
             # For now, we just mark it and it will be cleaned up by its worker.
             # Or, if agent.process supports cancellation, call it here.
             logger.info(f"Marcando tarea en ejecución {task_id} como cancelada.")
             # No la movemos a failed_tasks aquí, _process_single_task lo hará si la tarea termina por cancelación.
             # O si queremos forzarlo:
-            if task_id in self.running_tasks: del self.running_tasks[task_id] # remove from running
-            self.failed_tasks[task_id] = task_to_cancel # move to failed explicitly
+            self._remove_running(task_id) # remove from running
+            self._retain_failed(task_to_cancel) # move to failed explicitly
             await self._emit_event('task_cancelled', {'task_id': task_id})
+            await self._fail_dependents(task_id)
             return True
 
         # Buscar en tareas pendientes (en cola)
-        if task_id in self.pending_tasks_by_id:
-            task_to_cancel = self.pending_tasks_by_id[task_id]
+        task_to_cancel = self.pending_tasks_by_id.pop(task_id, None)
+        if task_to_cancel is not None:
             task_to_cancel.status = TaskStatus.CANCELLED
-            task_to_cancel.completed_at = datetime.utcnow()
-            
-            # Eliminar de pending_tasks_by_id
-            del self.pending_tasks_by_id[task_id]
+            task_to_cancel.completed_at = self._now()
             
             # Mover a failed_tasks
-            self.failed_tasks[task_id] = task_to_cancel
+            self._retain_failed(task_to_cancel)
+            # Si sigue en la cola queda como lápida: el worker la descarta al extraerla, o la
+            # cola la purga en bloque si se acumulan muchas
+            self.task_queue.discard(task_to_cancel)
             
             logger.info(f"Tarea pendiente {task_id} cancelada y removida de la cola.")
             await self._emit_event('task_cancelled', {'task_id': task_id})
-            # Nota: La tarea todavía está en self.task_queue. El worker la descartará
-            # cuando la obtenga y vea su estado CANCELLED o si ya no está en pending_tasks_by_id.
-            # Para una eliminación más limpia de la PriorityQueue, se necesitaría una implementación de PQ que soporte remove.
+            await self._fail_dependents(task_id)
             return True
             
         logger.warning(f"Intento de cancelar tarea {task_id} no encontrada en ejecución ni pendiente.")
@@ -888,19 +1193,22 @@ class Orchestrator:
         
         return False
 
-# Instancia global del orquestador
-orchestrator = Orchestrator()
+# Instancia global del orquestador, creada en el primer uso
+_orchestrator = None
 
 # Funciones de conveniencia
 async def start_orchestrator():
     """Inicia el orquestador global"""
-    await orchestrator.start()
+    await get_orchestrator().start()
 
 async def stop_orchestrator():
     """Detiene el orquestador global"""
-    await orchestrator.stop()
+    await get_orchestrator().stop()
 
 def get_orchestrator() -> Orchestrator:
     """Obtiene la instancia global del orquestador"""
-    return orchestrator
+    global _orchestrator
+    if _orchestrator is None:
+        _orchestrator = Orchestrator()
+    return _orchestrator
 
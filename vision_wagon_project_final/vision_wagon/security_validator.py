@@ -1,47 +1,154 @@
 import re
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import hyperscan # Optional: all threat patterns compiled into one DFA for validate_input
+except ImportError: # pragma: no cover - falls back to the combined re pattern
+    hyperscan = None
+
+# Threat patterns, frozen and compiled once at import for every validator instance
+_THREAT_PATTERNS = (
+    r"(union\s+select|insert\s+into|delete\s+from|drop\s+table)",
+    r"<script>.*?</script>",
+    r"(\/\*.*?\*\/|--\s)",
+    r"(\.\.\/|~\/|\\\.\\\.)",
+)
+_COMPILED_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in _THREAT_PATTERNS)
+# All patterns as one alternation: a single clean/dirty scan per string. Its leftmost matches
+# can hide overlapping or nested ones, so matches are always reported by the per-pattern regexes
+_COMBINED_PATTERN = re.compile(
+    "|".join(f"(?:{p})" for p in _THREAT_PATTERNS), re.IGNORECASE
+)
+
+def _compile_hyperscan():
+    """Hyperscan database for the threat patterns (match id = pattern index), or None"""
+    if hyperscan is None:
+        return None
+    # No HS_FLAG_SINGLEMATCH: with it, a pattern matching early can suppress a later pattern's match
+    flags = hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP
+    try:
+        db = hyperscan.Database()
+        db.compile(
+            expressions=[p.encode() for p in _THREAT_PATTERNS],
+            ids=list(range(len(_THREAT_PATTERNS))),
+            elements=len(_THREAT_PATTERNS),
+            flags=[flags] * len(_THREAT_PATTERNS),
+        )
+        return db
+    except Exception: # a pattern Hyperscan can't compile: keep scanning with re
+        return None
+
+_HS_DB = _compile_hyperscan()
+
+# Longest string whose scan/sanitize result is memoized; longer ones (content bodies) are scanned directly
+_CACHED_STRING_MAX = 256
+
+# From this many string leaves on, validate_input first scans them joined in a single pass
+_JOINED_SCAN_MIN_LEAVES = 8
+
+# validate_input node kinds, looked up by exact type(); subclasses are classified once and added
+_STR, _MAPPING, _SEQUENCE, _OTHER = 1, 2, 3, 4
+_NODE_KINDS: Dict[type, int] = {str: _STR, dict: _MAPPING, list: _SEQUENCE, tuple: _SEQUENCE, type(None): _OTHER}
+
+def _node_kind(value_type: type) -> int:
+    if issubclass(value_type, str):
+        kind = _STR
+    elif issubclass(value_type, dict):
+        kind = _MAPPING
+    elif issubclass(value_type, (list, tuple)):
+        kind = _SEQUENCE
+    else:
+        kind = _OTHER
+    _NODE_KINDS[value_type] = kind
+    return kind
+
+@lru_cache(maxsize=32)
+def _resolved_dirs(allowed_dirs: tuple) -> tuple:
+    """Resolved allowed directories; callers pass the same few lists over and over"""
+    return tuple(Path(allowed_dir).resolve() for allowed_dir in allowed_dirs)
+
+def _has_threat(text: str) -> bool:
+    """Whether any threat pattern occurs anywhere in text"""
+    if _HS_DB is not None:
+        found = []
+        _HS_DB.scan(text.encode('utf-8', 'replace'),
+                    match_event_handler=lambda pattern_id, start, end, flags, context: found.append(pattern_id))
+        return bool(found)
+    return _COMBINED_PATTERN.search(text) is not None
+
+def _matched_patterns(text: str) -> Tuple[int, ...]:
+    """Indexes of the threat patterns found in text, in pattern order"""
+    if _HS_DB is not None:
+        matched = set()
+        _HS_DB.scan(text.encode('utf-8', 'replace'),
+                    match_event_handler=lambda pattern_id, start, end, flags, context: matched.add(pattern_id))
+        return tuple(sorted(matched))
+    if _COMBINED_PATTERN.search(text) is None:
+        return ()
+    return tuple(i for i, pattern in enumerate(_COMPILED_PATTERNS) if pattern.search(text))
+
+def _redact(text: str) -> str:
+    if not _has_threat(text):
+        return text
+    for pattern in _COMPILED_PATTERNS:
+        text = pattern.sub("[REDACTED]", text)
+    return text
+
+# Short strings (keys, actions, statuses) repeat constantly: their scan/sanitize results are memoized,
+# keyed by the string and shared by every validator instance
+_matched_patterns_cached = lru_cache(maxsize=4096)(_matched_patterns)
+_redact_cached = lru_cache(maxsize=4096)(_redact)
 
 class SecurityValidator:
     def __init__(self):
-        self.threat_patterns = [
-            r"(union\s+select|insert\s+into|delete\s+from|drop\s+table)",
-            r"<script>.*?</script>",
-            r"(\/\*.*?\*\/|--\s)",
-            r"(\.\.\/|~\/|\\\.\\\.)"
-        ]
-        self.compiled_patterns = [re.compile(p, re.IGNORECASE) for p in self.threat_patterns]
+        # Shared module-level pattern objects; nothing is compiled per instance
+        self.threat_patterns = _THREAT_PATTERNS
+        self.compiled_patterns = _COMPILED_PATTERNS
+        self.combined_pattern = _COMBINED_PATTERN
 
     def validate_input(self, input_data: Any, field_name: str = None) -> List[str]:
         """Validate input data for potential security threats"""
+        # Explicit stack instead of recursion; children are pushed reversed so leaves keep document order
+        leaves = []
+        stack = [(input_data, field_name)]
+        while stack:
+            value, name = stack.pop()
+            kind = _NODE_KINDS.get(type(value)) or _node_kind(type(value))
+            if kind == _STR:
+                leaves.append((value, name))
+            elif kind == _MAPPING:
+                stack.extend(reversed([(item, key) for key, item in value.items()]))
+            elif kind == _SEQUENCE:
+                stack.extend((item, name) for item in reversed(value))
+
+        # Any per-leaf match is also a match in the joined text, so one miss clears the whole payload
+        # (the common case); a hit (possibly across a separator) falls back to the per-leaf scan
+        if len(leaves) >= _JOINED_SCAN_MIN_LEAVES and not _has_threat("\x00".join(text for text, _ in leaves)):
+            return []
+
         errors = []
-        if input_data is None:
-            return errors
-        if isinstance(input_data, dict):
-            for key, value in input_data.items():
-                errors.extend(self.validate_input(value, key))
-        elif isinstance(input_data, list):
-            for item in input_data:
-                errors.extend(self.validate_input(item, field_name))
-        elif isinstance(input_data, str):
-            for pattern in self.compiled_patterns:
-                if pattern.search(input_data):
-                    errors.append(f"Potential threat detected in {field_name or 'input'}: {pattern.pattern}")
+        for text, name in leaves:
+            scan = _matched_patterns_cached if len(text) <= _CACHED_STRING_MAX else _matched_patterns
+            for i in scan(text):
+                errors.append(f"Potential threat detected in {name or 'input'}: {self.threat_patterns[i]}")
         return errors
 
     def validate_file_path(self, path: str, allowed_dirs: List[str]) -> bool:
         """Validate file path to prevent directory traversal attacks"""
         try:
             resolved_path = Path(path).resolve()
-            return any(resolved_path.is_relative_to(Path(allowed_dir)) for allowed_dir in allowed_dirs)
+            return any(resolved_path.is_relative_to(allowed_dir) for allowed_dir in _resolved_dirs(tuple(allowed_dirs)))
         except Exception:
             return False
 
     def sanitize_input(self, input_data: Any) -> Any:
         """Sanitize input data by removing potentially dangerous content"""
         if isinstance(input_data, str):
-            for pattern in self.compiled_patterns:
-                input_data = pattern.sub("[REDACTED]", input_data)
+            if len(input_data) <= _CACHED_STRING_MAX:
+                return _redact_cached(input_data)
+            input_data = _redact(input_data)
         return input_data
 
 
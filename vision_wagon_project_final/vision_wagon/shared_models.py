@@ -1,16 +1,20 @@
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, field, fields
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 from .shared_enums import ContentType, GenerationStatus
 
-@dataclass
+# Python 3.10+: no per-instance __dict__ for these per-content records
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_DATACLASS_SLOTS)
 class GeneratedContent:
     content_id: str
     content_type: ContentType
     title: str
     description: str
     content_data: Any
-    created_at: datetime = datetime.utcnow()
+    created_at: datetime = field(default_factory=datetime.utcnow)
     file_path: Optional[str] = None
     size_bytes: Optional[int] = None
     metadata: Optional[Dict[str, Any]] = None
@@ -18,12 +22,16 @@ class GeneratedContent:
     duration: Optional[float] = None  # For audio/video (seconds)
     thumbnail: Optional[str] = None # Path to thumbnail image
 
-@dataclass
+    def to_dict(self) -> Dict[str, Any]:
+        """Campos como dict plano (sustituye a __dict__, que no existe con slots)"""
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+@dataclass(**_DATACLASS_SLOTS)
 class ContentRequest:
     request_id: str
     content_type: ContentType
     prompt: str
-    created_at: datetime = datetime.utcnow()
+    created_at: datetime = field(default_factory=datetime.utcnow)
     parameters: Dict[str, Any] = None
     style_guide: Optional[Dict[str, Any]] = None
     brand_guidelines: Optional[Dict[str, Any]] = None
@@ -3,6 +3,7 @@ import asyncio
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from unittest.mock import Mock, patch
 import os
 import sys
@@ -16,9 +17,14 @@ from agents.core.base_agent_core import BaseAgent
 from agents.campaign.campaign_agent import CampaignAgent
 from orchestrator import Orchestrator, Task, Priority, TaskStatus
 
-# Configuración de base de datos de prueba
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+# Configuración de base de datos de prueba: SQLite en memoria, una única conexión compartida
+# (StaticPool) para que todas las sesiones vean las mismas tablas, sin escribir a disco
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def override_get_db():
@@ -30,7 +36,7 @@ def override_get_db():
 
 app.dependency_overrides[get_db] = override_get_db
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def test_db():
     Base.metadata.create_all(bind=engine)
     yield